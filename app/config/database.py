@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 import os
 import time
@@ -23,6 +25,8 @@ DB_NAME = os.getenv("DB_NAME", "chatdb")
 
 # DB URL 구성
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# 비동기 드라이버(asyncpg)용 DB URL
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # 데이터베이스 연결 재시도 함수
 def create_db_engine(url, max_retries=10, retry_interval=30):
@@ -50,13 +54,37 @@ def create_db_engine(url, max_retries=10, retry_interval=30):
 # 엔진 생성
 engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
+# 동기 세션 - 마이그레이션 스크립트 등 동기 코드에서 사용
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 비동기 엔진 커넥션 풀 설정 (워커 프로세스당 최대 DB_POOL_SIZE + DB_MAX_OVERFLOW 개 연결)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# 풀이 가득 찼을 때 연결을 기다리는 최대 시간 (초)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# 오래된 연결 재생성 주기 (초, -1이면 사용 안 함)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# 비동기 엔진/세션 - 요청 핸들러, Socket.IO 이벤트, 서비스에서 사용 (이벤트 루프를 막지 않음)
+# 세션은 요청/이벤트마다 열고 끝나면 바로 닫아 연결을 풀에 반환
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE
+)
+
+# DB 헬스 체크 전용 엔진 - 매번 새 연결을 열고 바로 닫음 (NullPool)
+# 요청이 몰려 앱 풀이 가득 차도 헬스 체크가 풀을 기다리다 실패하지 않음
+health_check_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+# commit 이후에도 응답 직렬화를 위해 속성에 접근하므로 expire_on_commit=False
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,9 +1,19 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.config.database import engine, Base, SessionLocal
+from contextlib import asynccontextmanager
+from app.config.database import engine, async_engine, Base
+from app.service.db_health import db_health_monitor
+from app.service.password_hasher import password_hasher
+from app.service.delivery_service import delivery_tracker
+from app.service.presence import presence_manager
+from app.service.typing_tracker import typing_tracker
+from app.service.auth_timeouts import auth_timeouts
+from app.service.message_writer import message_writer
+from app.service.metrics import metrics, http_request_duration, instrument_engine
+from app.service.message_serializer import FastJSONResponse
 import logging
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 import time
 import json
 # 추가: Socket.IO를 위한 임포트
@@ -16,13 +26,43 @@ logger = logging.getLogger("app")
 
 # 모델 임포트 - 순서 중요 (의존성 있는 모델은 나중에 임포트)
 from app.models.user import User
+from app.models.conversation import Conversation
 from app.models.message import Message
 from app.models.contact import Contact
+from app.models.delivery_state import DeliveryState
+from app.models.unread_counter import UnreadCounter
+from app.models.conversation_summary import ConversationSummary
 
 # 라우터 임포트
 from app.routers import user, message, websocket, contact
 
-app = FastAPI()
+# 헬스 체크/메트릭 경로는 DB 서킷 상태와 무관하게 응답
+HEALTH_CHECK_PATHS = {"/health", "/ready", "/metrics"}
+
+# 커넥션 풀 상태를 /metrics 로 노출
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 백그라운드 작업 시작
+    db_health_monitor.start()
+    delivery_tracker.start()
+    presence_manager.start()
+    typing_tracker.start()
+    auth_timeouts.start()
+    message_writer.start()
+    yield
+    # 백그라운드 작업 종료 (대기 중인 메시지를 먼저 저장)
+    await message_writer.stop()
+    await db_health_monitor.stop()
+    await delivery_tracker.stop()
+    await presence_manager.stop()
+    await typing_tracker.stop()
+    await auth_timeouts.stop()
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Socket.IO를 FastAPI 앱에 마운트
 app.mount('/socket.io', socketio.ASGIApp(sio, socketio_path=''))
@@ -36,16 +76,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 데이터베이스 연결 상태 확인
+# 데이터베이스 연결 상태 확인 (백그라운드 모니터의 캐시된 상태만 사용)
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
-    try:
-        # 데이터베이스 연결 상태 테스트
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
-    except OperationalError as e:
-        logger.error(f"Database connection failed: {str(e)}")
+    if not db_health_monitor.healthy and request.url.path not in HEALTH_CHECK_PATHS:
+        # 서킷이 열린 동안에는 DB에 접근하지 않고 즉시 실패
         return Response(
             content=json.dumps({"detail": "Database connection error. Please try again later."}), 
             status_code=503,
@@ -55,6 +90,35 @@ async def db_session_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+def route_label(request: Request) -> str:
+    """
+    메트릭 레이블용 경로 - 경로 파라미터가 있는 라우트는 템플릿으로,
+    마운트된 앱(Socket.IO)은 마운트 경로로, 매칭되지 않은 경로는 하나로 묶어 레이블 수를 제한
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return request.scope.get("root_path") or "unmatched"
+    if getattr(route, "param_convertors", None):
+        return route.path
+    return request.url.path
+
+# 라우트별 요청 지연 시간 기록 (미들웨어 중 가장 바깥에서 측정)
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_request_duration.observe(
+            time.perf_counter() - started_at,
+            method=request.method,
+            route=route_label(request),
+            status=str(status)
+        )
+
 # 데이터베이스 테이블 생성
 try:
     Base.metadata.create_all(bind=engine)
@@ -73,3 +137,25 @@ app.include_router(contact.router, prefix="/contacts", tags=["contacts"])
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
+
+# liveness - 프로세스가 살아 있으면 항상 200
+@app.get("/health")
+def health():
+    return {"status": "ok", **db_health_monitor.status()}
+
+# Prometheus 텍스트 형식 메트릭
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# readiness - DB 서킷이 열려 있으면 503
+@app.get("/ready")
+def ready():
+    status = db_health_monitor.status()
+    if not db_health_monitor.healthy:
+        return Response(
+            content=json.dumps({"status": "unavailable", **status}),
+            status_code=503,
+            media_type="application/json"
+        )
+    return {"status": "ready", **status}
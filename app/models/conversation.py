@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, CheckConstraint
+from app.config.database import Base
+from datetime import datetime
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 두 사용자 ID를 정렬해서 저장 (user_low_id <= user_high_id) - 사용자 쌍당 하나의 대화
+    user_low_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_high_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_low_id", "user_high_id", name="uq_conversations_user_pair"),
+        CheckConstraint("user_low_id <= user_high_id", name="ck_conversations_user_order"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.config.database import Base
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    # 사용자별 대화 목록(inbox) - 대화의 마지막 메시지 정보를 참여자마다 한 행씩 저장
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), primary_key=True)
+    other_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_id = Column(Integer, nullable=False)
+    last_sender_id = Column(Integer, nullable=False)
+    last_message_preview = Column(String, nullable=False)
+    last_message_at = Column(DateTime, nullable=False)
+
+    # 최근 대화 순 페이지네이션 (user_id, last_message_id) - 메시지 ID는 전체에서 유일하므로 커서로 사용
+    __table_args__ = (
+        Index("ix_conversation_summaries_user_last_message", "user_id", "last_message_id"),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.config.database import Base
+from datetime import datetime
+
+class DeliveryState(Base):
+    __tablename__ = "delivery_states"
+
+    # 수신자별 전달 완료 워터마크 - 이 ID 이하의 수신 메시지는 모두 전달됨
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_delivered_message_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
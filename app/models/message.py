@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.config.database import Base
 
@@ -11,6 +11,15 @@ class Message(Base):
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_read = Column(Boolean, default=False, nullable=False)
+    # 기존 데이터는 migrate_conversations_postgresql.py 로 채운 뒤 사용
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=True)
 
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
+
+    # 대화별 히스토리 조회 (conversation_id, created_at, id) 키셋 페이지네이션용 인덱스
+    __table_args__ = (
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+        # 수신자별 미전달 메시지 조회 (receiver_id, id > 워터마크)
+        Index("ix_messages_receiver_id_id", "receiver_id", "id"),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.config.database import Base
+from datetime import datetime
+
+class UnreadCounter(Base):
+    __tablename__ = "unread_counters"
+
+    # 사용자별/대화별 읽지 않은 수신 메시지 수 - 전송/읽음 처리 시 증감
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
 from app.config.database import Base
 from sqlalchemy.orm import relationship
 
@@ -10,6 +10,15 @@ class User(Base):
     username = Column(String, nullable=False, unique=True)
     email = Column(String, nullable=False, unique=True)
     password = Column(String, nullable=False)
+
+    __table_args__ = (
+        # 사용자 검색 접두사 일치 (lower(email) LIKE 'term%')
+        # 부분 일치용 pg_trgm 인덱스는 확장이 필요하므로 migrate_user_search_postgresql.py 에서 생성
+        Index("ix_users_email_lower_prefix", func.lower(email).label("email_lower"),
+              postgresql_ops={"email_lower": "text_pattern_ops"}),
+        Index("ix_users_username_lower_prefix", func.lower(username).label("username_lower"),
+              postgresql_ops={"username_lower": "text_pattern_ops"}),
+    )
     
     # relationship 추가
     sent_messages = relationship("Message", foreign_keys="Message.sender_id", back_populates="sender")
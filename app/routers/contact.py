@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
-from app.service.contact_service import ContactService
+from app.service.contact_service import ContactService, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
 from pydantic import BaseModel, EmailStr
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 router = APIRouter()
 
@@ -24,10 +24,12 @@ class UserSearchResponse(BaseModel):
     email: str
 
 @router.get("/search")
-async def search_user(email: str, db: Session = Depends(get_db)):
-    """이메일로 사용자 검색 (부분 일치 지원)"""
+async def search_user(email: str,
+                      limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+                      db: AsyncSession = Depends(get_db)):
+    """이메일/사용자 이름으로 사용자 검색 (부분 일치 지원, 접두사 일치 우선)"""
     try:
-        users = ContactService.search_user_by_email(db, email)
+        users = await ContactService.search_user_by_email(db, email, limit=limit)
         return users
     except HTTPException as e:
         raise e
@@ -35,10 +37,10 @@ async def search_user(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"사용자 검색 중 오류가 발생했습니다: {str(e)}")
 
 @router.post("/add")
-async def add_contact(request: ContactAddRequest, user_id: int = Query(...), db: Session = Depends(get_db)):
+async def add_contact(request: ContactAddRequest, user_id: int = Query(...), db: AsyncSession = Depends(get_db)):
     """연락처에 사용자 추가"""
     try:
-        result = ContactService.add_contact(db, user_id, request.contact_email)
+        result = await ContactService.add_contact(db, user_id, request.contact_email)
         return result
     except HTTPException as e:
         raise e
@@ -46,10 +48,13 @@ async def add_contact(request: ContactAddRequest, user_id: int = Query(...), db:
         raise HTTPException(status_code=500, detail=f"연락처 추가 중 오류가 발생했습니다: {str(e)}")
 
 @router.get("/list")
-async def list_contacts(user_id: int = Query(...), db: Session = Depends(get_db)):
-    """사용자의 연락처 목록 조회"""
+async def list_contacts(user_id: int = Query(...),
+                        limit: Optional[int] = Query(None, ge=1, le=1000),
+                        after_id: Optional[int] = None,
+                        db: AsyncSession = Depends(get_db)):
+    """사용자의 연락처 목록 조회 (limit/after_id로 페이지 단위 조회 가능)"""
     try:
-        contacts = ContactService.get_user_contacts(db, user_id)
+        contacts = await ContactService.get_user_contacts(db, user_id, limit=limit, after_id=after_id)
         return contacts
     except HTTPException as e:
         raise e
@@ -57,10 +62,10 @@ async def list_contacts(user_id: int = Query(...), db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail=f"연락처 목록 조회 중 오류가 발생했습니다: {str(e)}")
 
 @router.delete("/remove")
-async def remove_contact(user_id: int = Query(...), contact_id: int = Query(...), db: Session = Depends(get_db)):
+async def remove_contact(user_id: int = Query(...), contact_id: int = Query(...), db: AsyncSession = Depends(get_db)):
     """연락처에서 사용자 제거"""
     try:
-        result = ContactService.remove_contact(db, user_id, contact_id)
+        result = await ContactService.remove_contact(db, user_id, contact_id)
         return result
     except HTTPException as e:
         raise e
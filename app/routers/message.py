@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
-from app.service.message_service import MessageService
+from app.service.message_service import MessageService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.service.conversation_service import (
+    ConversationService, DEFAULT_CONVERSATION_PAGE_SIZE, MAX_CONVERSATION_PAGE_SIZE
+)
 from app.models.message import Message
+from app.service.message_serializer import serialize_message, encode_message_page
 from pydantic import BaseModel
+from typing import Optional
 import logging
 
 router = APIRouter()
@@ -13,83 +19,120 @@ class MessageRequest(BaseModel):
     sender_id: int
     receiver_id: int
 
-# get all previous messages between two users
+# get previous messages between two users (keyset pagination)
 @router.get("/getpreviousmessages")
-async def get_previous_messages(user_id: int, other_user_id: int, db: Session = Depends(get_db)):
+async def get_previous_messages(user_id: int, other_user_id: int,
+                                before_id: Optional[int] = None, after_id: Optional[int] = None,
+                                limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                db: AsyncSession = Depends(get_db)):
     try:
-        messages = await MessageService.get_previous_messages(db, user_id, other_user_id)
+        messages, next_cursor = await MessageService.get_previous_messages(
+            db, user_id, other_user_id, before_id=before_id, after_id=after_id, limit=limit
+        )
         
-        # 메시지 객체를 직렬화 가능한 사전으로 변환
-        message_list = []
-        for msg in messages:
-            message_list.append({
-                "id": msg.id,
-                "content": msg.content,
-                "sender_id": msg.sender_id,
-                "receiver_id": msg.receiver_id,
-                "created_at": msg.created_at.isoformat(),
-                "is_read": msg.is_read
-            })
-        
-        return message_list
+        # 조회한 행을 바로 JSON 바이트로 인코딩 (jsonable_encoder 생략)
+        return Response(encode_message_page(messages, next_cursor), media_type="application/json")
     except HTTPException as he:
         raise he
     except Exception as e:
         logging.error(f"이전 메시지 조회 API 오류: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve previous messages: {str(e)}")
 
-# get messages between two users
+# get messages between two users (keyset pagination)
 @router.get("/getmessages")
-async def get_messages(user_id: int, other_user_id: int, db: Session = Depends(get_db)):
+async def get_messages(user_id: int, other_user_id: int,
+                       before_id: Optional[int] = None, after_id: Optional[int] = None,
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       db: AsyncSession = Depends(get_db)):
     try:
-        messages = await MessageService.get_messages_between_users(db, user_id, other_user_id)
-        
-        # 메시지 객체를 직렬화 가능한 사전으로 변환
-        message_list = []
-        for msg in messages:
-            message_list.append({
-                "id": msg.id,
-                "content": msg.content,
-                "sender_id": msg.sender_id,
-                "receiver_id": msg.receiver_id,
-                "created_at": msg.created_at.isoformat(),
-                "is_read": msg.is_read
-            })
+        messages, next_cursor = await MessageService.get_messages_between_users(
+            db, user_id, other_user_id, before_id=before_id, after_id=after_id, limit=limit
+        )
         
-        return message_list
+        # 조회한 행을 바로 JSON 바이트로 인코딩 (jsonable_encoder 생략)
+        return Response(encode_message_page(messages, next_cursor), media_type="application/json")
     except HTTPException as he:
         raise he
     except Exception as e:
         logging.error(f"메시지 조회 API 오류: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve messages: {str(e)}")
 
+# export the entire conversation between two users as NDJSON (streamed)
+@router.get("/export")
+async def export_messages(user_id: int, other_user_id: int):
+    """두 사용자 간의 전체 메시지를 한 줄에 하나씩(NDJSON) 스트리밍으로 내보내기 (백업/보관용)"""
+    try:
+        # 요청 단위 세션을 쓰면 스트리밍이 끝날 때까지 연결이 하나 더 잡히므로 get_db 를 사용하지 않음
+        chunks = await MessageService.export_messages(user_id, other_user_id)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logging.error(f"메시지 내보내기 API 오류: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to export messages: {str(e)}")
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="messages_{user_id}_{other_user_id}.ndjson"'}
+    )
+
 # send message to other user
 @router.post("/sendmessage")
-async def send_message(message: MessageRequest, db: Session = Depends(get_db)):
-    new_message = await MessageService.send_message_to_user(db, message)
+async def send_message(message: MessageRequest):
+    new_message = await MessageService.send_message_to_user(message)
     return {"message": "Message sent successfully", "message_id": new_message.id}
 
 # update message status to read
 @router.put("/updatemessagereadstatus")
-async def update_message_read_status(message_id: int, user_id: int, db: Session = Depends(get_db)):
+async def update_message_read_status(message_id: int, user_id: int, db: AsyncSession = Depends(get_db)):
     """메시지 읽음 상태 업데이트 (수신자만 가능)"""
     try:
         updated_message = await MessageService.update_message_read_status(db, message_id, user_id)
         return {
             "status": "success",
             "message": "Message read status updated successfully",
-            "data": {
-                "message_id": updated_message.id,
-                "content": updated_message.content,
-                "sender_id": updated_message.sender_id,
-                "receiver_id": updated_message.receiver_id,
-                "created_at": updated_message.created_at.isoformat(),
-                "is_read": updated_message.is_read
-            }
+            "data": serialize_message(updated_message, id_key="message_id")
         }
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+# get the user's conversations ordered by most recent message (inbox)
+@router.get("/conversations")
+async def get_conversations(user_id: int, before_id: Optional[int] = None,
+                            limit: int = Query(DEFAULT_CONVERSATION_PAGE_SIZE, ge=1, le=MAX_CONVERSATION_PAGE_SIZE),
+                            db: AsyncSession = Depends(get_db)):
+    """대화 목록 조회 (conversation_summaries 기반, 최근 메시지 순)"""
+    try:
+        conversations, next_cursor = await ConversationService.get_conversations(
+            db, user_id, before_id=before_id, limit=limit
+        )
+        return {"conversations": conversations, "next_cursor": next_cursor}
+    except Exception as e:
+        logging.error(f"대화 목록 조회 API 오류: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve conversations: {str(e)}")
+
+# get unread message counts per conversation
+@router.get("/unreadcounts")
+async def get_unread_counts(user_id: int, db: AsyncSession = Depends(get_db)):
+    """대화별 읽지 않은 메시지 수 조회"""
+    try:
+        return await MessageService.get_unread_counts(db, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve unread counts: {str(e)}")
 
+# mark all received messages in a conversation as read up to a message
+@router.put("/markreaduntil")
+async def mark_read_until(conversation_id: int, message_id: int, user_id: int, db: AsyncSession = Depends(get_db)):
+    """대화의 message_id 까지 받은 메시지를 한 번에 읽음 처리 (수신자만 가능)"""
+    try:
+        result = await MessageService.mark_read_until(db, conversation_id, user_id, message_id)
+        return {
+            "status": "success",
+            "message": "Messages marked as read",
+            "data": result
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
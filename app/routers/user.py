@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from app.config.database import get_db
 from app.models.user import User  # 임포트 경로 수정
 from app.service.user_service import UserService
@@ -34,10 +35,11 @@ class RegisterResponse(BaseModel):
     is_active: bool = True
 
 @router.get("/test")
-def userDBTest(db: Session = Depends(get_db)):
+async def userDBTest(db: AsyncSession = Depends(get_db)):
     try:
         # DB 연결 테스트 및 첫 번째 사용자 조회
-        user = db.query(User).first()
+        result = await db.execute(select(User))
+        user = result.scalars().first()
         if not user:
             return {"message": "사용자가 없습니다."}
         return user
@@ -48,12 +50,12 @@ def userDBTest(db: Session = Depends(get_db)):
         )
     
 @router.post("/register", response_model=UserResponse)
-def registerUser(request: RegisterRequestBody, db: Session = Depends(get_db)):
+async def registerUser(request: RegisterRequestBody, db: AsyncSession = Depends(get_db)):
     """
     새 사용자를 등록합니다.
     """
     try:
-        user = UserService.create_user(
+        user = await UserService.create_user(
             db=db,
             email=request.email,
             username=request.username,
@@ -79,9 +81,9 @@ def registerUser(request: RegisterRequestBody, db: Session = Depends(get_db)):
         )
     
 @router.post("/login", response_model=LoginResponse)
-def loginUser(request: LoginRequestBody, db: Session = Depends(get_db)):
+async def loginUser(request: LoginRequestBody, db: AsyncSession = Depends(get_db)):
     try:
-        user = UserService.verify_user_credentials(
+        user = await UserService.verify_user_credentials(
             db=db,
             email=request.email,
             password=request.password
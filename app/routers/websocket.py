@@ -1,19 +1,26 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status
-from sqlalchemy.orm import Session
-from app.config.database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
 from app.service.websocket_manager import manager
-from app.models.user import User
+from app.service.delivery_service import DeliveryService
+from app.service.presence import presence_manager
+from app.service.user_service import UserService
 import json
 
 router = APIRouter()
 
+# 접속 상태 다이제스트를 웹소켓 사용자에게도 전송
+async def send_presence_update(user_id: int, digest: dict):
+    await manager.send_personal_message({"type": "presence_update", **digest}, user_id)
+
+presence_manager.add_sink(send_presence_update)
+
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, user_id: int):
     await websocket.accept()  # 먼저 연결을 수락
+    registered = False
     
     try:
-        # 사용자 존재 여부 확인
-        user = db.query(User).filter(User.id == user_id).first()
+        # 사용자 존재 여부 확인 - 캐시에 없을 때만 세션을 열어 조회하고 바로 반환 (연결이 유지되는 동안 DB 연결을 잡지 않음)
+        user = await UserService.get_cached_user(None, user_id)
         if not user:
             # WebSocket에서는 HTTP 예외 대신 close로 연결 종료
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
@@ -21,14 +28,22 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
         
         # 웹소켓 연결 관리자에 등록
         await manager.connect(websocket, user_id)
+        presence_manager.user_connected(user_id)
+        registered = True
         
-        # 연결된 사용자에게 큐에 있는 메시지 전송
-        queued_messages = manager.get_queued_messages(user_id)
-        for message in queued_messages:
-            await websocket.send_json(message)
+        # 오프라인 동안 받은 메시지를 DB에서 배치 단위로 읽어 전송
+        # 이 연결의 송신 대기열을 거치며, 배치가 실제로 전송된 뒤에 워터마크가 갱신됨
+        async def send_batch(messages):
+            for message in messages:
+                if not await manager.send(websocket, user_id, message):
+                    raise WebSocketDisconnect()
+            if not await manager.flush(websocket, user_id):
+                raise WebSocketDisconnect()
+
+        await DeliveryService.stream_undelivered(user_id, send_batch)
         
         # 연결 성공 메시지 전송
-        await websocket.send_json({
+        await manager.send(websocket, user_id, {
             "type": "connection_established",
             "user_id": user_id,
             "message": "Successfully connected to websocket"
@@ -48,16 +63,14 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
                 pass
             
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        # 연결 종료 시 다른 사용자에게 알림 (선택사항)
-        await manager.broadcast({
-            "type": "user_disconnected",
-            "user_id": user_id
-        })
+        pass
     except Exception as e:
         # 기타 예외 처리
         if websocket.client_state.CONNECTED:  # 연결이 아직 활성 상태인 경우
             await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason=str(e))
-        # 연결이 이미 관리자에 등록된 경우 연결 해제
-        if user_id in manager.active_connections:
-            manager.disconnect(user_id) 
\ No newline at end of file
+    finally:
+        if registered:
+            # 이 연결이 아직 등록되어 있으면 해제 (새 연결로 교체된 경우는 유지)
+            manager.disconnect(user_id, websocket)
+            # 연락처에 등록한 사용자에게만 다이제스트로 알림 (grace 기간 이후)
+            presence_manager.user_disconnected(user_id) 
\ No newline at end of file
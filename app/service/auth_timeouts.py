@@ -0,0 +1,89 @@
+from collections import deque
+from typing import Deque, Dict, List, Tuple, Callable, Awaitable, Any, Optional
+import asyncio
+import logging
+import os
+import time
+
+# 로깅 설정
+logger = logging.getLogger("auth_timeouts")
+
+# 접속 후 이 시간 안에 authenticate 하지 않으면 연결 종료 (초)
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "30"))
+# 만료 확인 주기 (초) - 실제 종료 시점은 최대 이 값만큼 늦어질 수 있음
+AUTH_TIMEOUT_SWEEP_INTERVAL = float(os.getenv("AUTH_TIMEOUT_SWEEP_INTERVAL", "1"))
+
+# 만료된 sid 목록을 받아 연결을 끊는 함수
+ExpiredSink = Callable[[List[str]], Awaitable[Any]]
+
+class AuthTimeoutSweeper:
+    """
+    인증하지 않은 연결의 타임아웃을 하나의 주기 작업으로 처리
+    연결마다 sleep 작업을 만들지 않고 (마감 시각, sid) 만 기록
+    타임아웃이 고정이므로 등록 순서가 곧 마감 순서 -> 힙 대신 deque 로 O(1) 등록/만료
+    인증/종료된 sid 는 dict 에서만 지우고 deque 항목은 만료 시점에 건너뜀
+    """
+
+    def __init__(self, timeout: float = AUTH_TIMEOUT, sweep_interval: float = AUTH_TIMEOUT_SWEEP_INTERVAL):
+        self.timeout = timeout
+        self.sweep_interval = sweep_interval
+        self._deadlines: Dict[str, float] = {}
+        self._queue: Deque[Tuple[float, str]] = deque()
+        self._sinks: List[ExpiredSink] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_sink(self, sink: ExpiredSink):
+        self._sinks.append(sink)
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def track(self, sid: str):
+        deadline = time.monotonic() + self.timeout
+        self._deadlines[sid] = deadline
+        self._queue.append((deadline, sid))
+
+    def discard(self, sid: str):
+        """인증 완료 또는 연결 종료"""
+        self._deadlines.pop(sid, None)
+
+    def expire(self) -> List[str]:
+        now = time.monotonic()
+        expired = []
+        while self._queue and self._queue[0][0] <= now:
+            deadline, sid = self._queue.popleft()
+            # 이미 인증/종료되었거나 같은 sid 가 다시 등록된 경우 건너뜀
+            if self._deadlines.get(sid) == deadline:
+                del self._deadlines[sid]
+                expired.append(sid)
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            expired = self.expire()
+            if not expired:
+                continue
+            logger.warning(f"Authentication timeout for {len(expired)} connection(s)")
+            for sink in self._sinks:
+                try:
+                    await sink(expired)
+                except Exception as e:
+                    logger.error(f"Failed to close unauthenticated connections: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# 전역 인증 타임아웃 관리자 인스턴스 생성
+auth_timeouts = AuthTimeoutSweeper()
@@ -0,0 +1,67 @@
+from typing import Dict, Set, Optional
+import time
+
+class Connection:
+    """Socket.IO 연결 하나 (인증된 sid)"""
+    __slots__ = ("sid", "user_id", "connected_at")
+
+    def __init__(self, sid: str, user_id: int):
+        self.sid = sid
+        self.user_id = user_id
+        self.connected_at = time.monotonic()
+
+class ConnectionRegistry:
+    """
+    인증된 Socket.IO 연결 관리 - 사용자당 여러 기기(sid) 지원
+    sid -> Connection, user_id -> sid 집합 두 인덱스를 함께 갱신하므로 서로 어긋나지 않음
+    사용자 ID는 항상 int 로 저장, 추가/삭제/조회 모두 O(1)
+    """
+
+    def __init__(self):
+        self._by_sid: Dict[str, Connection] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+
+    def add(self, sid: str, user_id: int) -> bool:
+        """연결 등록. 이미 같은 사용자로 등록된 sid 면 False"""
+        current = self._by_sid.get(sid)
+        if current is not None:
+            if current.user_id == user_id:
+                return False
+            # 같은 sid 가 다른 사용자로 다시 인증한 경우 기존 등록 해제
+            self.remove(sid)
+        self._by_sid[sid] = Connection(sid, user_id)
+        self._by_user.setdefault(user_id, set()).add(sid)
+        return True
+
+    def remove(self, sid: str) -> Optional[Connection]:
+        """연결 해제. 등록되지 않은 sid 면 None"""
+        connection = self._by_sid.pop(sid, None)
+        if connection is None:
+            return None
+        sids = self._by_user.get(connection.user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._by_user[connection.user_id]
+        return connection
+
+    def user_id(self, sid: str) -> Optional[int]:
+        connection = self._by_sid.get(sid)
+        return connection.user_id if connection is not None else None
+
+    def sids(self, user_id: int) -> Set[str]:
+        return set(self._by_user.get(user_id, ()))
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._by_user
+
+    @property
+    def user_count(self) -> int:
+        return len(self._by_user)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._by_sid)
+
+# 전역 연결 관리자 인스턴스 생성
+connection_registry = ConnectionRegistry()
@@ -1,20 +1,79 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from fastapi import HTTPException
 from app.models.user import User
 from app.models.contact import Contact
-from typing import List, Dict, Any
+from app.service.lru_cache import LRUCache
+from typing import List, Dict, Any, Optional
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import or_, select, func, case
+import os
+
+# 사용자별 연락처 목록 캐시 (추가/삭제 시 무효화, 다른 워커의 변경은 TTL 이후 반영)
+CONTACT_CACHE_SIZE = int(os.getenv("CONTACT_CACHE_SIZE", "10000"))
+CONTACT_CACHE_TTL = float(os.getenv("CONTACT_CACHE_TTL", "60"))
+contact_cache = LRUCache(maxsize=CONTACT_CACHE_SIZE, ttl=CONTACT_CACHE_TTL)
+
+# 사용자 검색 결과 기본/최대 개수
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
 
 class ContactService:
     @staticmethod
-    def search_user_by_email(db: Session, email: str) -> List[Dict[str, Any]]:
-        """이메일로 사용자 검색 (부분 일치 지원)"""
+    async def search_user_by_email(db: AsyncSession, email: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """
+        이메일/사용자 이름으로 사용자 검색 (부분 일치 지원)
+        1. 접두사 일치를 먼저 조회 (lower(...) text_pattern_ops 인덱스)
+        2. 부족한 만큼 부분 일치로 채움 (pg_trgm GIN 인덱스)
+        정확히 일치 > 앞쪽에서 일치 > 짧은 이메일 순으로 정렬하고 limit개까지만 반환
+        """
         if not email or len(email) < 3:
             raise HTTPException(status_code=400, detail="검색어는 최소 3자 이상이어야 합니다")
-            
-        users = db.query(User).filter(User.email.like(f"%{email}%")).all()
-        
+
+        term = email.lower()
+        # LIKE 특수문자 이스케이프
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        lower_email = func.lower(User.email)
+        lower_username = func.lower(User.username)
+
+        # 1. 접두사 일치 (빠른 경로)
+        result = await db.execute(
+            select(User)
+            .filter(or_(
+                lower_email.like(f"{escaped}%", escape="\\"),
+                lower_username.like(f"{escaped}%", escape="\\")
+            ))
+            .order_by(
+                case((or_(lower_email == term, lower_username == term), 0), else_=1),
+                func.length(User.email),
+                User.id
+            )
+            .limit(limit)
+        )
+        users = list(result.scalars().all())
+
+        # 2. 부분 일치로 나머지 채우기
+        if len(users) < limit:
+            found_ids = [user.id for user in users]
+            query = select(User).filter(or_(
+                lower_email.like(f"%{escaped}%", escape="\\"),
+                lower_username.like(f"%{escaped}%", escape="\\")
+            ))
+            if found_ids:
+                query = query.filter(User.id.notin_(found_ids))
+            result = await db.execute(
+                query.order_by(
+                    func.least(
+                        func.nullif(func.strpos(lower_email, term), 0),
+                        func.nullif(func.strpos(lower_username, term), 0)
+                    ),
+                    func.length(User.email),
+                    User.id
+                )
+                .limit(limit - len(users))
+            )
+            users.extend(result.scalars().all())
+
         return [
             {
                 "id": user.id,
@@ -25,15 +84,16 @@ class ContactService:
         ]
     
     @staticmethod
-    def add_contact(db: Session, user_id: int, contact_email: str) -> Dict[str, Any]:
+    async def add_contact(db: AsyncSession, user_id: int, contact_email: str) -> Dict[str, Any]:
         """연락처에 사용자 추가"""
         # 현재 사용자 확인
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
             
         # 연락처로 추가할 사용자 확인
-        contact_user = db.query(User).filter(User.email == contact_email).first()
+        result = await db.execute(select(User).filter(User.email == contact_email))
+        contact_user = result.scalars().first()
         if not contact_user:
             raise HTTPException(status_code=404, detail="추가하려는 연락처 사용자를 찾을 수 없습니다")
             
@@ -42,10 +102,11 @@ class ContactService:
             raise HTTPException(status_code=400, detail="자기 자신을 연락처로 추가할 수 없습니다")
             
         # 이미 연락처로 추가되어 있는지 확인
-        existing_contact = db.query(Contact).filter(
+        result = await db.execute(select(Contact).filter(
             Contact.user_id == user_id,
             Contact.contact_id == contact_user.id
-        ).first()
+        ))
+        existing_contact = result.scalars().first()
         
         if existing_contact:
             raise HTTPException(status_code=400, detail="이미 연락처로 추가된 사용자입니다")
@@ -58,8 +119,9 @@ class ContactService:
         
         try:
             db.add(new_contact)
-            db.commit()
-            db.refresh(new_contact)
+            await db.commit()
+            await db.refresh(new_contact)
+            contact_cache.invalidate(user_id)
             
             return {
                 "id": new_contact.id,
@@ -71,57 +133,92 @@ class ContactService:
                 "created_at": new_contact.created_at.isoformat()
             }
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=500, detail=f"연락처 추가 중 오류가 발생했습니다: {str(e)}")
     
     @staticmethod
-    def get_user_contacts(db: Session, user_id: int) -> List[Dict[str, Any]]:
-        """사용자의 연락처 목록 조회"""
-        # 사용자 존재 확인
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+    async def get_user_contacts(db: AsyncSession, user_id: int,
+                                limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        사용자의 연락처 목록 조회
+        - 사용자 확인과 연락처/연락처 사용자 정보를 한 번의 조인 쿼리로 조회
+        - limit/after_id(마지막으로 받은 연락처 id)로 페이지 단위 조회 가능 - 필요한 페이지만 DB에서 조회
+        - 전체 목록 조회 결과만 사용자별로 캐시
+        """
+        paged = limit is not None or after_id is not None
+        if not paged:
+            contacts = contact_cache.get(user_id)
+            if contacts is not None:
+                return contacts
+
+        # 연락처 조건을 조인 조건에 넣어 해당 페이지에 연락처가 없어도 사용자 행은 남김 (사용자 존재 확인용)
+        contact_filter = Contact.user_id == User.id
+        if after_id is not None:
+            contact_filter = contact_filter & (Contact.id > after_id)
+        contact_user = aliased(User)
+        query = (
+            select(
+                Contact.id.label("id"),
+                Contact.created_at.label("created_at"),
+                contact_user.id.label("contact_user_id"),
+                contact_user.username.label("username"),
+                contact_user.email.label("email")
+            )
+            .select_from(User)
+            .outerjoin(Contact, contact_filter)
+            .outerjoin(contact_user, contact_user.id == Contact.contact_id)
+            .filter(User.id == user_id)
+            .order_by(Contact.id)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        rows = result.all()
+
+        # 사용자 존재 확인 (사용자가 없으면 행이 없음)
+        if not rows:
             raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
-            
-        # 사용자의 연락처 목록 조회
-        contacts = db.query(Contact).filter(Contact.user_id == user_id).all()
-        
-        result = []
-        for contact in contacts:
-            contact_user = db.query(User).filter(User.id == contact.contact_id).first()
-            if contact_user:
-                result.append({
-                    "id": contact.id,
-                    "contact": {
-                        "id": contact_user.id,
-                        "username": contact_user.username,
-                        "email": contact_user.email
-                    },
-                    "created_at": contact.created_at.isoformat()
-                })
-                
-        return result
+
+        contacts = [
+            {
+                "id": row.id,
+                "contact": {
+                    "id": row.contact_user_id,
+                    "username": row.username,
+                    "email": row.email
+                },
+                "created_at": row.created_at.isoformat()
+            }
+            for row in rows
+            if row.id is not None and row.contact_user_id is not None
+        ]
+        if not paged:
+            contact_cache.set(user_id, contacts)
+        return contacts
     
     @staticmethod
-    def remove_contact(db: Session, user_id: int, contact_id: int) -> Dict[str, Any]:
+    async def remove_contact(db: AsyncSession, user_id: int, contact_id: int) -> Dict[str, Any]:
         """연락처에서 사용자 제거"""
         # 사용자 존재 확인
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
             
         # 연락처 찾기
-        contact = db.query(Contact).filter(
+        result = await db.execute(select(Contact).filter(
             Contact.user_id == user_id,
             Contact.id == contact_id
-        ).first()
+        ))
+        contact = result.scalars().first()
         
         if not contact:
             raise HTTPException(status_code=404, detail="삭제할 연락처를 찾을 수 없습니다")
             
         try:
-            db.delete(contact)
-            db.commit()
+            await db.delete(contact)
+            await db.commit()
+            contact_cache.invalidate(user_id)
             return {"message": "연락처가 성공적으로 삭제되었습니다", "contact_id": contact_id}
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=500, detail=f"연락처 삭제 중 오류가 발생했습니다: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,157 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_, and_
+from sqlalchemy.dialects.postgresql import insert
+from app.models.conversation import Conversation
+from app.models.conversation_summary import ConversationSummary
+from app.models.message import Message
+from app.models.unread_counter import UnreadCounter
+from app.models.user import User
+from typing import Optional, Tuple, Dict, Iterable, Set, List
+
+# 대화 목록에 저장하는 마지막 메시지 미리보기 길이
+SUMMARY_PREVIEW_LENGTH = 100
+# 대화 목록 한 페이지 기본/최대 개수
+DEFAULT_CONVERSATION_PAGE_SIZE = 30
+MAX_CONVERSATION_PAGE_SIZE = 100
+
+class ConversationService:
+
+    @staticmethod
+    def ordered_pair(user_id: int, other_user_id: int) -> Tuple[int, int]:
+        """사용자 쌍을 (작은 ID, 큰 ID) 순서로 정렬"""
+        return (user_id, other_user_id) if user_id <= other_user_id else (other_user_id, user_id)
+
+    @staticmethod
+    async def get_conversation_id(db: AsyncSession, user_id: int, other_user_id: int) -> Optional[int]:
+        """두 사용자 간 대화 ID 조회 (없으면 None)"""
+        low_id, high_id = ConversationService.ordered_pair(user_id, other_user_id)
+        result = await db.execute(
+            select(Conversation.id).filter(
+                Conversation.user_low_id == low_id,
+                Conversation.user_high_id == high_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def _get_conversation_ids(db: AsyncSession, pairs: Set[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
+        result = await db.execute(
+            select(Conversation.user_low_id, Conversation.user_high_id, Conversation.id).filter(
+                tuple_(Conversation.user_low_id, Conversation.user_high_id).in_(list(pairs))
+            )
+        )
+        return {(low_id, high_id): conversation_id for low_id, high_id, conversation_id in result}
+
+    @staticmethod
+    async def get_or_create_conversation_ids(db: AsyncSession,
+                                             pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
+        """
+        여러 사용자 쌍의 대화 ID를 한 번에 조회, 없는 대화는 한 번의 INSERT로 생성
+        반환값의 키는 ordered_pair 로 정렬된 쌍 (commit은 호출한 쪽에서 처리)
+        """
+        ordered = {ConversationService.ordered_pair(user_id, other_user_id) for user_id, other_user_id in pairs}
+        if not ordered:
+            return {}
+
+        conversation_ids = await ConversationService._get_conversation_ids(db, ordered)
+        missing = ordered - conversation_ids.keys()
+        if missing:
+            await db.execute(
+                insert(Conversation)
+                .values([{"user_low_id": low_id, "user_high_id": high_id} for low_id, high_id in sorted(missing)])
+                .on_conflict_do_nothing(index_elements=["user_low_id", "user_high_id"])
+            )
+            # 다른 요청이 먼저 생성한 대화까지 포함해 다시 조회
+            conversation_ids.update(await ConversationService._get_conversation_ids(db, missing))
+        return conversation_ids
+
+    @staticmethod
+    async def update_summaries(db: AsyncSession, messages: Iterable[Message]):
+        """
+        저장된 메시지로 두 참여자의 대화 목록(conversation_summaries) 갱신
+        대화별 마지막 메시지만 반영하며, 더 최신 메시지가 이미 반영된 경우 덮어쓰지 않음
+        (commit은 호출한 쪽에서 처리)
+        """
+        latest: Dict[int, Message] = {}
+        for message in messages:
+            current = latest.get(message.conversation_id)
+            if current is None or message.id > current.id:
+                latest[message.conversation_id] = message
+        if not latest:
+            return
+
+        rows = []
+        for conversation_id, message in latest.items():
+            preview = message.content[:SUMMARY_PREVIEW_LENGTH]
+            for user_id, other_user_id in ((message.sender_id, message.receiver_id),
+                                           (message.receiver_id, message.sender_id)):
+                rows.append({
+                    "user_id": user_id,
+                    "conversation_id": conversation_id,
+                    "other_user_id": other_user_id,
+                    "last_message_id": message.id,
+                    "last_sender_id": message.sender_id,
+                    "last_message_preview": preview,
+                    "last_message_at": message.created_at
+                })
+                if user_id == other_user_id:
+                    # 자기 자신과의 대화는 한 행만 저장
+                    break
+
+        # 항상 같은 키 순서로 행을 잠가, 동시에 실행되는 배치끼리 교착 상태가 생기지 않도록 정렬
+        rows.sort(key=lambda row: (row["conversation_id"], row["user_id"]))
+        stmt = insert(ConversationSummary).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConversationSummary.user_id, ConversationSummary.conversation_id],
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_sender_id": stmt.excluded.last_sender_id,
+                "last_message_preview": stmt.excluded.last_message_preview,
+                "last_message_at": stmt.excluded.last_message_at
+            },
+            where=ConversationSummary.last_message_id < stmt.excluded.last_message_id
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def get_conversations(db: AsyncSession, user_id: int, before_id: Optional[int] = None,
+                                limit: int = DEFAULT_CONVERSATION_PAGE_SIZE):
+        """
+        최근 메시지 순 대화 목록 (마지막 메시지, 읽지 않은 메시지 수 포함)
+        before_id: 이전 페이지의 next_cursor (마지막 메시지 ID) - 이보다 오래된 대화 조회
+        """
+        query = (
+            select(ConversationSummary, User.username, UnreadCounter.unread_count)
+            .join(User, User.id == ConversationSummary.other_user_id)
+            .outerjoin(UnreadCounter, and_(
+                UnreadCounter.user_id == ConversationSummary.user_id,
+                UnreadCounter.conversation_id == ConversationSummary.conversation_id
+            ))
+            .filter(ConversationSummary.user_id == user_id)
+        )
+        if before_id is not None:
+            query = query.filter(ConversationSummary.last_message_id < before_id)
+        result = await db.execute(
+            query.order_by(ConversationSummary.last_message_id.desc()).limit(limit + 1)
+        )
+        rows = result.all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        conversations: List[dict] = [
+            {
+                "conversation_id": summary.conversation_id,
+                "other_user_id": summary.other_user_id,
+                "other_username": username,
+                "last_message": {
+                    "message_id": summary.last_message_id,
+                    "sender_id": summary.last_sender_id,
+                    "preview": summary.last_message_preview,
+                    "created_at": summary.last_message_at.isoformat()
+                },
+                "unread_count": unread_count or 0
+            }
+            for summary, username, unread_count in rows
+        ]
+        next_cursor = rows[-1][0].last_message_id if has_more else None
+        return conversations, next_cursor
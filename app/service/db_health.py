@@ -0,0 +1,104 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config.database import health_check_engine
+from datetime import datetime
+from typing import Optional, Dict, Any
+import asyncio
+import logging
+import os
+
+# 로깅 설정
+logger = logging.getLogger("db_health")
+
+# 헬스 체크 설정 (초 단위)
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "5"))
+DB_HEALTH_RECOVERY_INTERVAL = float(os.getenv("DB_HEALTH_RECOVERY_INTERVAL", "1"))
+DB_HEALTH_PROBE_TIMEOUT = float(os.getenv("DB_HEALTH_PROBE_TIMEOUT", "2"))
+DB_HEALTH_FAILURE_THRESHOLD = int(os.getenv("DB_HEALTH_FAILURE_THRESHOLD", "2"))
+
+class DatabaseHealthMonitor:
+    """
+    백그라운드에서 주기적으로 DB 상태를 확인하고 결과를 캐시
+    앱 풀이 포화된 것(대기 시간 초과)은 DB 장애가 아니므로 풀을 거치지 않는 엔진으로 확인
+    연속 실패가 임계값에 도달하면 서킷을 열고(open), 복구될 때까지 짧은 간격으로 재확인
+    요청 처리 경로에서는 캐시된 상태만 읽으므로 DB 왕복이 발생하지 않음
+    """
+
+    def __init__(self, engine: AsyncEngine,
+                 interval: float = DB_HEALTH_CHECK_INTERVAL,
+                 recovery_interval: float = DB_HEALTH_RECOVERY_INTERVAL,
+                 probe_timeout: float = DB_HEALTH_PROBE_TIMEOUT,
+                 failure_threshold: int = DB_HEALTH_FAILURE_THRESHOLD):
+        self.engine = engine
+        self.interval = interval
+        self.recovery_interval = recovery_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        # 서버 시작 시 DB 연결은 이미 확인되었으므로 정상 상태로 시작
+        self.circuit_open = False
+        self.consecutive_failures = 0
+        self.last_checked: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return not self.circuit_open
+
+    async def _select_one(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def probe(self) -> bool:
+        """SELECT 1로 DB 상태 확인 후 서킷 상태 갱신"""
+        try:
+            # 연결 획득까지 포함해서 타임아웃 적용
+            await asyncio.wait_for(self._select_one(), timeout=self.probe_timeout)
+            if self.circuit_open:
+                logger.info("Database connection recovered, closing circuit")
+            self.circuit_open = False
+            self.consecutive_failures = 0
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.last_error = str(e) or e.__class__.__name__
+            if not self.circuit_open and self.consecutive_failures >= self.failure_threshold:
+                logger.error(f"Database health check failed {self.consecutive_failures} times, opening circuit: {self.last_error}")
+                self.circuit_open = True
+            else:
+                logger.warning(f"Database health check failed: {self.last_error}")
+            return False
+        finally:
+            self.last_checked = datetime.utcnow()
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            # 서킷이 열려 있으면 더 자주 확인하여 빠르게 복구
+            await asyncio.sleep(self.recovery_interval if self.circuit_open else self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Database health monitor started (interval={self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "database": "up" if self.healthy else "down",
+            "consecutive_failures": self.consecutive_failures,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None,
+            "last_error": self.last_error
+        }
+
+# 전역 헬스 모니터 인스턴스 생성 (앱 커넥션 풀과 분리된 전용 엔진 사용)
+db_health_monitor = DatabaseHealthMonitor(health_check_engine)
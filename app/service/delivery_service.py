@@ -0,0 +1,162 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from app.config.database import AsyncSessionLocal
+from app.models.message import Message
+from app.models.delivery_state import DeliveryState
+from app.service.metrics import metrics
+from app.service.message_serializer import MESSAGE_COLUMNS, serialize_message
+from datetime import datetime
+from typing import Dict, Any, List, Callable, Awaitable, Optional
+import asyncio
+import logging
+import os
+
+# 로깅 설정
+logger = logging.getLogger("delivery")
+
+# 재접속 시 한 번에 조회/전송하는 미전달 메시지 수
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "100"))
+# 실시간 전달 워터마크를 DB에 모아서 반영하는 주기 (초)
+DELIVERY_FLUSH_INTERVAL = float(os.getenv("DELIVERY_FLUSH_INTERVAL", "1"))
+
+class DeliveryService:
+    """
+    수신자별 워터마크(last_delivered_message_id)로 오프라인 메시지 전달 관리
+    메시지는 이미 messages 테이블에 저장되어 있으므로 메모리에 큐를 두지 않고,
+    재접속 시 워터마크 이후의 메시지를 배치 단위로 DB에서 읽어 전송
+    """
+
+    @staticmethod
+    def message_payload(message: Message) -> Dict[str, Any]:
+        """실시간 전달(new_message)용 메시지 데이터"""
+        return serialize_message(message, id_key="message_id", time_key="timestamp")
+
+    @staticmethod
+    async def get_watermark(db: AsyncSession, user_id: int) -> int:
+        result = await db.execute(
+            select(DeliveryState.last_delivered_message_id).filter(DeliveryState.user_id == user_id)
+        )
+        return result.scalar_one_or_none() or 0
+
+    @staticmethod
+    async def advance_watermarks(db: AsyncSession, watermarks: Dict[int, int]):
+        """여러 사용자의 워터마크를 한 번에 갱신 (값이 줄어들지 않도록 GREATEST 사용)"""
+        if not watermarks:
+            return
+        now = datetime.utcnow()
+        stmt = insert(DeliveryState).values([
+            {"user_id": user_id, "last_delivered_message_id": message_id, "updated_at": now}
+            for user_id, message_id in sorted(watermarks.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DeliveryState.user_id],
+            set_={
+                "last_delivered_message_id": func.greatest(
+                    DeliveryState.last_delivered_message_id, stmt.excluded.last_delivered_message_id
+                ),
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        await db.execute(stmt)
+        await db.commit()
+
+    @staticmethod
+    async def stream_undelivered(user_id: int,
+                                 send_batch: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+                                 last_received_id: Optional[int] = None,
+                                 batch_size: int = DELIVERY_BATCH_SIZE) -> int:
+        """
+        워터마크 이후의 수신 메시지를 batch_size 단위로 전송하고 배치마다 워터마크 갱신
+        last_received_id: 클라이언트가 이미 받은 마지막 메시지 ID (있으면 그 이후부터 전송)
+        전송한 메시지 수 반환
+        """
+        total = 0
+        async with AsyncSessionLocal() as db:
+            watermark = await DeliveryService.get_watermark(db, user_id)
+            if last_received_id is not None and last_received_id > watermark:
+                watermark = last_received_id
+                await DeliveryService.advance_watermarks(db, {user_id: watermark})
+
+            while True:
+                result = await db.execute(
+                    select(*MESSAGE_COLUMNS)
+                    .filter(Message.receiver_id == user_id, Message.id > watermark)
+                    .order_by(Message.id)
+                    .limit(batch_size)
+                )
+                messages = result.all()
+                if not messages:
+                    break
+
+                # 읽기 트랜잭션을 끝내 전송하는 동안에는 연결을 풀에 반환 (느린 클라이언트가 연결을 잡고 있지 않도록)
+                payloads = [DeliveryService.message_payload(message) for message in messages]
+                await db.commit()
+                await send_batch(payloads)
+                watermark = messages[-1].id
+                total += len(messages)
+                await DeliveryService.advance_watermarks(db, {user_id: watermark})
+
+                if len(messages) < batch_size:
+                    break
+
+        if total:
+            logger.info(f"Delivered {total} stored messages to user {user_id}")
+        return total
+
+class DeliveryTracker:
+    """
+    실시간으로 전달된 메시지의 워터마크를 메모리에 모았다가 주기적으로 한 번에 DB에 반영
+    메모리 사용량은 최근 메시지를 받은 온라인 사용자 수에 비례
+    """
+
+    def __init__(self, flush_interval: float = DELIVERY_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def mark_delivered(self, user_id: int, message_id: int):
+        if message_id > self._pending.get(user_id, 0):
+            self._pending[user_id] = message_id
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with AsyncSessionLocal() as db:
+                await DeliveryService.advance_watermarks(db, pending)
+        except Exception as e:
+            logger.error(f"Failed to flush delivery watermarks: {str(e)}")
+            # 실패한 워터마크는 다음 주기에 다시 시도
+            for user_id, message_id in pending.items():
+                self.mark_delivered(user_id, message_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+# 전역 전달 워터마크 트래커 인스턴스 생성
+delivery_tracker = DeliveryTracker()
+
+metrics.gauge("chat_delivery_pending_watermarks", "Users whose live-delivery watermark is waiting to be flushed",
+              function=lambda: delivery_tracker.pending)
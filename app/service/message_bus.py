@@ -0,0 +1,219 @@
+"""
+Socket.IO client manager (message bus) selection.
+
+- memory: single process, events never leave the process (default)
+- unix:   multiple workers on one host, relayed through a Unix domain socket hub
+- redis:  multiple workers/nodes through Redis (or any Redis-compatible server)
+"""
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from typing import Any, Callable, List, Optional, Set
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+
+logger = logging.getLogger("message_bus")
+
+# Message bus configuration
+SOCKETIO_MESSAGE_BUS = os.getenv("SOCKETIO_MESSAGE_BUS", "memory")  # memory | unix | redis
+SOCKETIO_MESSAGE_BUS_URL = os.getenv("SOCKETIO_MESSAGE_BUS_URL", "")
+SOCKETIO_MESSAGE_BUS_CHANNEL = os.getenv("SOCKETIO_MESSAGE_BUS_CHANNEL", "chatserver")
+
+DEFAULT_UNIX_BUS_URL = "unix:///tmp/chatserver-socketio.sock"
+DEFAULT_REDIS_BUS_URL = "redis://localhost:6379/0"
+
+# Length-prefixed frames on the Unix socket
+_FRAME_HEADER = struct.Struct("!I")
+# Listeners whose unsent backlog exceeds this are dropped (they reconnect)
+_MAX_LISTENER_BACKLOG = 16 * 1024 * 1024
+
+_ROLE_LISTENER = b"L"
+_ROLE_PUBLISHER = b"P"
+
+# hook(event, data, room) called after an event was handed to this process's clients
+LocalEmitHook = Callable[[str, Any, Optional[str]], None]
+
+
+class LocalEmitHooksMixin:
+    """Lets the application observe events delivered to clients of this process.
+
+    With a pub/sub bus the worker that emits an event is usually not the one
+    holding the recipient's connection; only the receiving side knows that
+    the event actually reached a local client.
+    """
+
+    def add_local_emit_hook(self, hook: LocalEmitHook):
+        if not hasattr(self, '_local_emit_hooks'):
+            self._local_emit_hooks: List[LocalEmitHook] = []
+        self._local_emit_hooks.append(hook)
+
+    def _run_local_emit_hooks(self, event, data, room):
+        for hook in getattr(self, '_local_emit_hooks', ()):
+            try:
+                hook(event, data, room)
+            except Exception:
+                logger.exception(f'Local emit hook failed for {event}')
+
+
+class MemoryManager(LocalEmitHooksMixin, socketio.AsyncManager):
+    """Single-process client manager"""
+    name = 'memory'
+
+    async def emit(self, event, data, namespace, room=None, skip_sid=None,
+                   callback=None, to=None, **kwargs):
+        await super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                           callback=callback, to=to, **kwargs)
+        self._run_local_emit_hooks(event, data, to or room)
+
+
+class PubSubLocalEmitMixin(LocalEmitHooksMixin):
+    """Runs the hooks when a published event is delivered in this worker"""
+
+    async def _handle_emit(self, message):
+        await super()._handle_emit(message)
+        data = message['data']
+        # Single non-binary payloads travel as [data]
+        if not message.get('binary') and isinstance(data, list) and len(data) == 1:
+            self._run_local_emit_hooks(message['event'], data[0],
+                                       message.get('room'))
+
+
+def _encode_frame(payload: bytes) -> bytes:
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(_FRAME_HEADER.size)
+    (length,) = _FRAME_HEADER.unpack(header)
+    return await reader.readexactly(length)
+
+
+class UnixSocketManager(PubSubLocalEmitMixin, AsyncPubSubManager):
+    """Pub/sub client manager for several workers on the same host.
+
+    The first worker that takes an exclusive lock on ``<path>.lock`` binds
+    the Unix socket and relays every published frame to all listeners
+    (including itself). Other workers connect as clients. If the hub
+    worker exits, its lock is released and the next worker to reconnect
+    takes over.
+    """
+    name = 'unix'
+
+    def __init__(self, url=DEFAULT_UNIX_BUS_URL, channel='socketio',
+                 write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only,
+                         logger=logger, json=json)
+        self.path = url[len('unix://'):] if url.startswith('unix://') else url
+        self._lock_file = None
+        self._hub_server: Optional[asyncio.AbstractServer] = None
+        self._hub_lock = asyncio.Lock()
+        self._listeners: Set[asyncio.StreamWriter] = set()
+        self._publisher: Optional[asyncio.StreamWriter] = None
+        self._publish_lock = asyncio.Lock()
+
+    def _acquire_hub_lock(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.path + '.lock', 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _ensure_hub(self):
+        async with self._hub_lock:
+            if self._hub_server is not None or not self._acquire_hub_lock():
+                return
+            # Socket file left behind by a hub that died
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._hub_server = await asyncio.start_unix_server(
+                self._handle_peer, path=self.path)
+            self._get_logger().info(f'Socket.IO bus hub listening on {self.path}')
+
+    async def _handle_peer(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter):
+        try:
+            role = await reader.readexactly(1)
+            if role == _ROLE_LISTENER:
+                self._listeners.add(writer)
+                # Listeners never send anything; wait for them to go away
+                await reader.read()
+            else:
+                while True:
+                    frame = _encode_frame(await _read_frame(reader))
+                    for listener in list(self._listeners):
+                        if listener.transport.get_write_buffer_size() > _MAX_LISTENER_BACKLOG:
+                            self._get_logger().warning('Dropping slow Socket.IO bus listener')
+                            self._listeners.discard(listener)
+                            listener.close()
+                            continue
+                        listener.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._listeners.discard(writer)
+            writer.close()
+
+    async def _connect(self, role: bytes):
+        await self._ensure_hub()
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        writer.write(role)
+        await writer.drain()
+        return reader, writer
+
+    async def _publish(self, data):
+        frame = _encode_frame(self.json.dumps(
+            {'channel': self.channel, 'data': data}).encode('utf-8'))
+        for retries_left in range(1, -1, -1):  # 2 attempts
+            try:
+                async with self._publish_lock:
+                    if self._publisher is None or self._publisher.is_closing():
+                        _, self._publisher = await self._connect(_ROLE_PUBLISHER)
+                    self._publisher.write(frame)
+                    await self._publisher.drain()
+                return
+            except (OSError, ConnectionError) as exc:
+                self._publisher = None
+                if not retries_left:
+                    self._get_logger().error(
+                        f'Cannot publish to Socket.IO bus: {exc}')
+
+    async def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                reader, writer = await self._connect(_ROLE_LISTENER)
+                retry_sleep = 1
+                while True:
+                    message = self.json.loads(await _read_frame(reader))
+                    if message.get('channel') == self.channel:
+                        yield message['data']
+            except (OSError, ConnectionError, asyncio.IncompleteReadError) as exc:
+                self._get_logger().error(
+                    f'Socket.IO bus connection lost ({exc}), retrying in {retry_sleep}s')
+                await asyncio.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+class RedisManager(PubSubLocalEmitMixin, socketio.AsyncRedisManager):
+    """Redis client manager with local emit hooks"""
+
+
+def create_client_manager(bus: str = SOCKETIO_MESSAGE_BUS,
+                          url: str = SOCKETIO_MESSAGE_BUS_URL,
+                          channel: str = SOCKETIO_MESSAGE_BUS_CHANNEL) -> socketio.AsyncManager:
+    """Create the Socket.IO client manager for the configured bus"""
+    if bus == "memory":
+        return MemoryManager()
+    if bus == "unix":
+        return UnixSocketManager(url or DEFAULT_UNIX_BUS_URL, channel=channel)
+    if bus == "redis":
+        return RedisManager(url or DEFAULT_REDIS_BUS_URL, channel=channel)
+    raise ValueError(f"Unknown SOCKETIO_MESSAGE_BUS: {bus}")
+
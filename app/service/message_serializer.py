@@ -0,0 +1,70 @@
+from starlette.responses import JSONResponse
+from app.models.message import Message
+from typing import Any, Dict, Iterable, Optional
+import json
+
+# orjson 이 설치되어 있으면 사용 (없으면 표준 json 모듈로 같은 결과 생성)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 메시지 조회 시 ORM 객체 대신 가져오는 컬럼 (행의 속성 이름이 Message 와 같음)
+MESSAGE_COLUMNS = (
+    Message.id, Message.conversation_id, Message.content, Message.sender_id,
+    Message.receiver_id, Message.created_at, Message.is_read
+)
+
+def dumps(value: Any) -> bytes:
+    """JSON 인코딩 (Starlette JSONResponse 와 같은 출력 형식)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads(value):
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+class FastJSONResponse(JSONResponse):
+    """앱 기본 응답 클래스 - orjson 으로 인코딩"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class SocketIOJSON:
+    """python-socketio 패킷 인코딩용 json 모듈 대체 (dumps 는 문자열 반환)"""
+
+    @staticmethod
+    def dumps(value: Any, **kwargs) -> str:
+        return dumps(value).decode("utf-8")
+
+    @staticmethod
+    def loads(value, **kwargs):
+        return loads(value)
+
+def serialize_message(message, id_key: str = "id", time_key: str = "created_at") -> Dict[str, Any]:
+    """
+    메시지 하나를 응답/이벤트용 사전으로 변환 (REST, Socket.IO, 웹소켓 공용)
+    Message 객체와 MESSAGE_COLUMNS 로 조회한 행 모두 사용 가능
+    기존 클라이언트 호환을 위해 ID/시간 필드 이름만 경로별로 다름
+    - REST 조회/내보내기: id, created_at
+    - 실시간 전달(new_message 등): message_id, timestamp
+    """
+    return {
+        id_key: message.id,
+        "conversation_id": message.conversation_id,
+        "content": message.content,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        time_key: message.created_at.isoformat(),
+        "is_read": message.is_read
+    }
+
+def encode_message_page(messages: Iterable, next_cursor: Optional[int]) -> bytes:
+    """조회 결과 행을 {"messages": [...], "next_cursor": ...} JSON 바이트로 바로 인코딩"""
+    return dumps({"messages": [serialize_message(message) for message in messages], "next_cursor": next_cursor})
+
+def encode_message_lines(messages: Iterable) -> bytes:
+    """NDJSON (한 줄에 메시지 하나)"""
+    return b"".join(dumps(serialize_message(message)) + b"\n" for message in messages)
@@ -1,31 +1,99 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import AsyncSessionLocal
+from sqlalchemy import select, tuple_, update
 from fastapi import HTTPException
 from app.models.message import Message
-from app.models.user import User
+from app.models.conversation import Conversation
+from app.service.conversation_service import ConversationService
+from app.service.delivery_service import DeliveryService
+from app.service.message_writer import message_writer
+from app.service.unread_service import UnreadService
+from app.service.message_serializer import MESSAGE_COLUMNS, encode_message_lines
+from app.service.user_service import UserService
 from datetime import datetime
+from typing import Optional, AsyncIterator
 import asyncio
 import logging
+import os
+
+# 한 번에 조회하는 메시지 기본/최대 개수
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# 전체 대화 내보내기에서 서버 측 커서로 한 번에 가져오는 행 수 (응답 청크 하나의 메시지 수)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
 
 class MessageService:
 
+    @staticmethod
+    async def _get_message_page(db: AsyncSession, user_id: int, other_user_id: int,
+                                before_id: Optional[int] = None, after_id: Optional[int] = None,
+                                limit: int = DEFAULT_PAGE_SIZE):
+        """
+        (created_at, id) 기준 키셋 페이지네이션
+        - 커서 없음: 가장 최근 limit개
+        - before_id: 해당 메시지보다 이전 limit개
+        - after_id: 해당 메시지보다 이후 limit개
+        결과는 항상 오래된 순으로 정렬되며, 다음 페이지가 있으면 next_cursor를 함께 반환
+        """
+        if before_id is not None and after_id is not None:
+            raise HTTPException(status_code=400, detail="before_id and after_id cannot be used together")
+
+        # 대화 ID 기준으로 조회 -> (conversation_id, created_at, id) 인덱스 범위 스캔
+        conversation_id = await ConversationService.get_conversation_id(db, user_id, other_user_id)
+        if conversation_id is None:
+            return [], None
+
+        # ORM 객체를 만들지 않고 필요한 컬럼만 행으로 조회 (응답에서 바로 인코딩)
+        query = select(*MESSAGE_COLUMNS).filter(Message.conversation_id == conversation_id)
+        seek_key = tuple_(Message.created_at, Message.id)
+
+        cursor_id = before_id if before_id is not None else after_id
+        if cursor_id is not None:
+            # 커서 메시지가 두 사용자 간의 메시지인지 확인
+            anchor = await db.get(Message, cursor_id)
+            if not anchor or anchor.conversation_id != conversation_id:
+                raise HTTPException(status_code=404, detail="Cursor message not found")
+            if before_id is not None:
+                query = query.filter(seek_key < tuple_(anchor.created_at, anchor.id))
+            else:
+                query = query.filter(seek_key > tuple_(anchor.created_at, anchor.id))
+
+        # 다음 페이지 존재 여부 확인을 위해 limit + 1개 조회
+        if after_id is not None:
+            query = query.order_by(Message.created_at, Message.id)
+        else:
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+        result = await db.execute(query.limit(limit + 1))
+        messages = list(result.all())
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if after_id is None:
+            messages.reverse()
+
+        next_cursor = None
+        if has_more and messages:
+            # 이전 방향이면 가장 오래된 메시지, 이후 방향이면 가장 최근 메시지가 다음 커서
+            next_cursor = messages[-1].id if after_id is not None else messages[0].id
+
+        return messages, next_cursor
+
     # get all previous messages between two users
     @staticmethod
-    async def get_previous_messages(db: Session, user_id: int, other_user_id: int):
+    async def get_previous_messages(db: AsyncSession, user_id: int, other_user_id: int,
+                                    before_id: Optional[int] = None, after_id: Optional[int] = None,
+                                    limit: int = DEFAULT_PAGE_SIZE):
         try:
-            # 두 사용자가 존재하는지 확인
-            sender = db.query(User).filter(User.id == user_id).first()
-            receiver = db.query(User).filter(User.id == other_user_id).first()
+            # 두 사용자가 존재하는지 확인 (사용자 캐시)
+            users = await UserService.get_cached_users(db, (user_id, other_user_id))
             
-            if not sender or not receiver:
+            if user_id not in users or other_user_id not in users:
                 raise HTTPException(status_code=404, detail="User not found")
                 
             # 두 사용자 간의 메시지 조회
-            messages = db.query(Message).filter(
-                ((Message.sender_id == user_id) & (Message.receiver_id == other_user_id)) |
-                ((Message.sender_id == other_user_id) & (Message.receiver_id == user_id))
-            ).order_by(Message.created_at).all()
-            
-            return messages
+            return await MessageService._get_message_page(
+                db, user_id, other_user_id, before_id=before_id, after_id=after_id, limit=limit
+            )
         except HTTPException as he:
             raise he
         except Exception as e:
@@ -35,17 +103,20 @@ class MessageService:
             )
 
     @staticmethod
-    async def get_messages_between_users(db: Session, user_id: int, other_user_id: int):
+    async def get_messages_between_users(db: AsyncSession, user_id: int, other_user_id: int,
+                                         before_id: Optional[int] = None, after_id: Optional[int] = None,
+                                         limit: int = DEFAULT_PAGE_SIZE):
         try:
             logging.info(f"메시지 조회 시작: user_id={user_id}, other_user_id={other_user_id}")
             
-            # 두 사용자가 존재하는지 확인
-            sender = db.query(User).filter(User.id == user_id).first()
+            # 두 사용자가 존재하는지 확인 (사용자 캐시, 없는 사용자만 한 번에 조회)
+            users = await UserService.get_cached_users(db, (user_id, other_user_id))
+            sender = users.get(user_id)
             if not sender:
                 logging.warning(f"발신자(ID: {user_id})를 찾을 수 없음")
                 raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
                 
-            receiver = db.query(User).filter(User.id == other_user_id).first()
+            receiver = users.get(other_user_id)
             if not receiver:
                 logging.warning(f"수신자(ID: {other_user_id})를 찾을 수 없음")
                 raise HTTPException(status_code=404, detail=f"User with ID {other_user_id} not found")
@@ -54,13 +125,14 @@ class MessageService:
             
             # 두 사용자 간의 메시지 조회
             try:
-                messages = db.query(Message).filter(
-                    ((Message.sender_id == user_id) & (Message.receiver_id == other_user_id)) |
-                    ((Message.sender_id == other_user_id) & (Message.receiver_id == user_id))
-                ).order_by(Message.created_at).all()
+                messages, next_cursor = await MessageService._get_message_page(
+                    db, user_id, other_user_id, before_id=before_id, after_id=after_id, limit=limit
+                )
                 
                 logging.info(f"메시지 조회 완료: {len(messages)}개 메시지 발견")
-                return messages
+                return messages, next_cursor
+            except HTTPException:
+                raise
             except Exception as query_error:
                 logging.error(f"메시지 쿼리 중 오류 발생: {str(query_error)}", exc_info=True)
                 raise
@@ -76,57 +148,75 @@ class MessageService:
             )
 
     @staticmethod
-    async def send_message_to_user(db: Session, message_data):
-        try:
-            # 발신자와 수신자가 존재하는지 확인
-            sender = db.query(User).filter(User.id == message_data.sender_id).first()
-            receiver = db.query(User).filter(User.id == message_data.receiver_id).first()
-            
-            if not sender or not receiver:
+    async def export_messages(user_id: int, other_user_id: int,
+                              batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+        """
+        두 사용자 간의 전체 메시지를 오래된 순으로 NDJSON(한 줄에 메시지 하나) 청크로 내보냄
+        사용자/대화 확인은 바로 수행하고, 실제 조회는 반환된 제너레이터를 읽을 때 시작
+        서버 측 커서로 batch_size 행씩 가져오므로 대화 크기와 관계없이 메모리 사용량이 일정
+        요청 단위 세션(get_db)은 응답 본문 전송이 끝날 때까지 반환되지 않으므로 사용하지 않음
+        """
+        # 확인용 세션은 스트리밍 시작 전에 닫아 연결을 풀에 반환
+        async with AsyncSessionLocal() as db:
+            users = await UserService.get_cached_users(db, (user_id, other_user_id))
+            if user_id not in users or other_user_id not in users:
                 raise HTTPException(status_code=404, detail="User not found")
-            
-            # 새 메시지 생성
-            new_message = Message(
-                content=message_data.content,
-                sender_id=message_data.sender_id,
-                receiver_id=message_data.receiver_id,
-                created_at=datetime.utcnow(),
-                is_read=False
+            conversation_id = await ConversationService.get_conversation_id(db, user_id, other_user_id)
+
+        async def stream() -> AsyncIterator[bytes]:
+            if conversation_id is None:
+                return
+            # 응답을 보내는 동안에는 이 세션의 연결 하나만 사용
+            async with AsyncSessionLocal() as export_db:
+                # ORM 객체 대신 컬럼만 조회 - identity map 에 쌓이지 않음
+                result = await export_db.stream(
+                    select(*MESSAGE_COLUMNS)
+                    .filter(Message.conversation_id == conversation_id)
+                    .order_by(Message.created_at, Message.id)
+                    .execution_options(yield_per=batch_size)
+                )
+                try:
+                    async for rows in result.partitions():
+                        yield encode_message_lines(rows)
+                finally:
+                    await result.close()
+
+        return stream()
+
+    @staticmethod
+    async def send_message_to_user(message_data):
+        """
+        메시지 저장은 message_writer 에 맡김 (다른 메시지와 함께 배치 INSERT/commit)
+        commit 이후 저장된 메시지를 받아 실시간 전송
+        """
+        try:
+            new_message = await message_writer.submit(
+                message_data.sender_id, message_data.receiver_id, message_data.content
             )
-            
-            db.add(new_message)
-            db.commit()
-            db.refresh(new_message)
-
-            # Socket.IO를 통해 실시간 메시지 전송
-            message_payload = {
-                "message_id": new_message.id,
-                "content": new_message.content,
-                "sender_id": new_message.sender_id,
-                "receiver_id": new_message.receiver_id,
-                "timestamp": new_message.created_at.isoformat(),
-                "is_read": new_message.is_read
-            }
-            
-            # 지연 임포트로 원형 참조 방지
-            from app.socketio_server import send_personal_message
-            
-            # 비동기 함수이므로 asyncio.create_task를 통해 호출
-            asyncio.create_task(send_personal_message(str(new_message.receiver_id), message_payload))
-            
-            return new_message
+        except HTTPException:
+            raise
         except Exception as e:
-            db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to send message: {str(e)}"
             )
 
+        # Socket.IO를 통해 실시간 메시지 전송 (오프라인이면 재접속 시 DB에서 전달)
+        message_payload = DeliveryService.message_payload(new_message)
+
+        # 지연 임포트로 원형 참조 방지
+        from app.socketio_server import send_personal_message
+
+        # 비동기 함수이므로 asyncio.create_task를 통해 호출
+        asyncio.create_task(send_personal_message(new_message.receiver_id, message_payload))
+
+        return new_message
+
     @staticmethod
-    async def update_message_read_status(db: Session, message_id: int, user_id: int):
+    async def update_message_read_status(db: AsyncSession, message_id: int, user_id: int):
         try:
             # 메시지 조회
-            message = db.query(Message).filter(Message.id == message_id).first()
+            message = await db.get(Message, message_id)
             if not message:
                 raise HTTPException(status_code=404, detail="Message not found")
             
@@ -138,26 +228,36 @@ class MessageService:
             if message.is_read:
                 return message
             
-            # 읽음 상태 업데이트
-            message.is_read = True
-            db.commit()
-            db.refresh(message)
+            # 읽음 상태 업데이트 (동시에 읽음 처리되면 한 번만 반영되도록 조건부 UPDATE)
+            result = await db.execute(
+                update(Message)
+                .where(Message.id == message_id, Message.is_read == False)
+                .values(is_read=True)
+                .returning(Message.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is None:
+                await db.rollback()
+                await db.refresh(message)
+                return message
+            await UnreadService.decrement(db, user_id, message.conversation_id, 1)
+            await db.commit()
+            await db.refresh(message)
             
             # Socket.IO를 통해 발신자에게 읽음 상태 알림 (비동기 처리)
             try:
                 # 지연 임포트로 원형 참조 방지
-                from app.socketio_server import send_personal_message
+                from app.socketio_server import send_user_event
                 
                 # 읽음 상태 알림 데이터
                 read_notification = {
-                    "type": "message_read",
                     "message_id": message.id,
                     "reader_id": user_id,
                     "timestamp": datetime.utcnow().isoformat()
                 }
                 
-                # 비동기 처리
-                asyncio.create_task(send_personal_message(str(message.sender_id), read_notification))
+                # 비동기 처리 (읽음 알림은 오프라인 사용자에게 저장하지 않음)
+                asyncio.create_task(send_user_event(message.sender_id, "message_read", read_notification))
             except Exception as e:
                 # 소켓 알림 실패는 API 응답에 영향을 주지 않도록 함
                 logging.error(f"Failed to send read notification: {str(e)}")
@@ -173,4 +273,85 @@ class MessageService:
                 status_code=500,
                 detail=f"Failed to update message read status: {str(e)}"
             )
-    
\ No newline at end of file
+
+    @staticmethod
+    async def get_unread_counts(db: AsyncSession, user_id: int):
+        """대화별 읽지 않은 메시지 수 (unread_counters 조회)"""
+        unread_counts = await UnreadService.get_unread_counts(db, user_id)
+        return {
+            "unread_counts": unread_counts,
+            "total_unread": sum(item["unread_count"] for item in unread_counts)
+        }
+
+    @staticmethod
+    async def mark_read_until(db: AsyncSession, conversation_id: int, user_id: int, message_id: int):
+        """
+        대화에서 message_id 까지(포함) 받은 메시지를 한 번의 UPDATE로 모두 읽음 처리하고
+        발신자에게 읽음 알림(messages_read)을 한 번만 전송
+        """
+        try:
+            # 대화 참여자인지 확인
+            conversation = await db.get(Conversation, conversation_id)
+            if not conversation:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+            if user_id not in (conversation.user_low_id, conversation.user_high_id):
+                raise HTTPException(status_code=403, detail="Not authorized to update this conversation")
+
+            # 기준 메시지 확인
+            anchor = await db.get(Message, message_id)
+            if not anchor or anchor.conversation_id != conversation_id:
+                raise HTTPException(status_code=404, detail="Message not found")
+
+            # 기준 메시지 이전의 읽지 않은 수신 메시지를 한 번에 읽음 처리
+            result = await db.execute(
+                update(Message)
+                .where(
+                    Message.conversation_id == conversation_id,
+                    Message.receiver_id == user_id,
+                    Message.is_read == False,
+                    tuple_(Message.created_at, Message.id) <= tuple_(anchor.created_at, anchor.id)
+                )
+                .values(is_read=True)
+                .returning(Message.id)
+                .execution_options(synchronize_session=False)
+            )
+            updated_ids = result.scalars().all()
+            await UnreadService.decrement(db, user_id, conversation_id, len(updated_ids))
+            await db.commit()
+
+            other_user_id = (
+                conversation.user_high_id if user_id == conversation.user_low_id else conversation.user_low_id
+            )
+
+            # 실제로 읽음 처리된 메시지가 있을 때만 발신자에게 알림
+            if updated_ids:
+                try:
+                    # 지연 임포트로 원형 참조 방지
+                    from app.socketio_server import send_user_event
+
+                    read_receipt = {
+                        "conversation_id": conversation_id,
+                        "reader_id": user_id,
+                        "up_to_message_id": message_id,
+                        "count": len(updated_ids),
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                    asyncio.create_task(send_user_event(other_user_id, "messages_read", read_receipt))
+                except Exception as e:
+                    # 소켓 알림 실패는 API 응답에 영향을 주지 않도록 함
+                    logging.error(f"Failed to send read receipt: {str(e)}")
+
+            return {
+                "conversation_id": conversation_id,
+                "up_to_message_id": message_id,
+                "updated_count": len(updated_ids)
+            }
+
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to mark messages as read: {str(e)}"
+            )
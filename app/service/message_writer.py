@@ -0,0 +1,235 @@
+from sqlalchemy import insert
+from fastapi import HTTPException
+from app.config.database import AsyncSessionLocal
+from app.models.message import Message
+from app.service.conversation_service import ConversationService
+from app.service.unread_service import UnreadService
+from app.service.user_service import UserService
+from app.service.metrics import metrics
+from datetime import datetime
+from typing import List, Optional
+from collections import Counter
+import asyncio
+import logging
+import os
+
+# 로깅 설정
+logger = logging.getLogger("message_writer")
+
+# 한 번의 INSERT/commit 으로 저장하는 최대 메시지 수
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "200"))
+# 첫 메시지 이후 배치를 채우기 위해 기다리는 시간 (초)
+MESSAGE_WRITE_WINDOW = float(os.getenv("MESSAGE_WRITE_WINDOW", "0.005"))
+# 저장 대기열 최대 길이 (가득 차면 503)
+MESSAGE_WRITE_QUEUE_SIZE = int(os.getenv("MESSAGE_WRITE_QUEUE_SIZE", "10000"))
+# 종료 시 남은 메시지를 저장하며 기다리는 최대 시간 (초) - 넘으면 작업을 취소
+MESSAGE_WRITE_STOP_TIMEOUT = float(os.getenv("MESSAGE_WRITE_STOP_TIMEOUT", "10"))
+
+# 대기열에 넣어 writer 작업에 종료를 알리는 값
+_STOP = object()
+
+class _PendingMessage:
+    __slots__ = ("sender_id", "receiver_id", "content", "created_at", "future")
+
+    def __init__(self, sender_id: int, receiver_id: int, content: str, future: asyncio.Future):
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.content = content
+        self.created_at = datetime.utcnow()
+        self.future = future
+
+class MessageWriter:
+    """
+    메시지 저장 파이프라인 (REST sendmessage / Socket.IO message 공용)
+    메시지를 큐에 넣으면 writer 작업이 짧은 시간/개수 단위로 모아
+    여러 행 INSERT ... RETURNING 과 한 번의 commit 으로 저장한 뒤 발신자에게 ID를 돌려줌
+    처리량이 commit 지연이 아니라 배치 크기에 비례
+    """
+
+    def __init__(self, batch_size: int = MESSAGE_WRITE_BATCH_SIZE, window: float = MESSAGE_WRITE_WINDOW,
+                 max_queue: int = MESSAGE_WRITE_QUEUE_SIZE, stop_timeout: float = MESSAGE_WRITE_STOP_TIMEOUT):
+        self.batch_size = batch_size
+        self.window = window
+        self.stop_timeout = stop_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        # 모니터링용 카운터
+        self.batches = 0
+        self.written = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, sender_id: int, receiver_id: int, content: str) -> Message:
+        """메시지를 저장 대기열에 넣고, commit 이후 저장된 Message 반환"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingMessage(sender_id, receiver_id, content, future))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Message queue is full, please retry",
+                headers={"Retry-After": "1"}
+            )
+        return await future
+
+    def _drain(self, batch: List[_PendingMessage]):
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _write_batch(self, batch: List[_PendingMessage]):
+        """
+        배치 저장. 실패하면 (트랜잭션은 롤백됨) 반으로 나눠 다시 저장해서 문제가 된 메시지만 실패 처리
+        오류 내용에는 다른 사용자의 메시지가 들어 있을 수 있으므로 서버 로그에만 남김
+        """
+        try:
+            await self._write(batch)
+        except Exception:
+            batch = [item for item in batch if not item.future.done()]
+            if len(batch) > 1:
+                logger.warning(f"Failed to write message batch of {len(batch)}, retrying in halves", exc_info=True)
+                middle = len(batch) // 2
+                await self._write_batch(batch[:middle])
+                await self._write_batch(batch[middle:])
+                return
+            logger.exception("Failed to write message")
+            self._fail(batch, HTTPException(status_code=500, detail="Failed to send message"))
+
+    @staticmethod
+    def _fail(batch: List[_PendingMessage], error: Exception):
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(error)
+
+    async def _run(self):
+        batch: List[_PendingMessage] = []
+        try:
+            stopping = False
+            while not stopping:
+                batch = [await self._queue.get()]
+                self._drain(batch)
+                if _STOP not in batch and len(batch) < self.batch_size and self.window > 0:
+                    # 동시에 들어오는 메시지를 같은 배치로 모음
+                    await asyncio.sleep(self.window)
+                    self._drain(batch)
+                stopping = _STOP in batch
+                batch = [item for item in batch if item is not _STOP]
+                if batch:
+                    await self._write_batch(batch)
+                batch = []
+
+            # 종료 신호 이후에 들어온 메시지까지 저장
+            while not self._queue.empty():
+                batch = []
+                self._drain(batch)
+                batch = [item for item in batch if item is not _STOP]
+                if batch:
+                    await self._write_batch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # 종료 제한 시간을 넘겨 취소된 경우 - 꺼내 둔 배치의 요청에 실패를 알림
+            self._fail([item for item in batch if item is not _STOP],
+                       HTTPException(status_code=503, detail="Server is shutting down"))
+            raise
+
+    async def _write(self, batch: List[_PendingMessage]):
+        # 요청이 이미 취소된 메시지는 저장하지 않음
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        async with AsyncSessionLocal() as db:
+            # 발신자/수신자 존재 여부를 한 번에 확인 (사용자 캐시에 없는 ID만 조회)
+            user_ids = {item.sender_id for item in batch} | {item.receiver_id for item in batch}
+            existing = await UserService.get_cached_users(db, user_ids)
+
+            valid = []
+            for item in batch:
+                if item.sender_id in existing and item.receiver_id in existing:
+                    valid.append(item)
+                elif not item.future.done():
+                    # 사용자 조회 중에 요청이 취소되었을 수 있음
+                    item.future.set_exception(HTTPException(status_code=404, detail="User not found"))
+            if not valid:
+                return
+
+            conversation_ids = await ConversationService.get_or_create_conversation_ids(
+                db, [(item.sender_id, item.receiver_id) for item in valid]
+            )
+
+            # 여러 행 INSERT ... RETURNING (입력 순서대로 반환)
+            result = await db.scalars(
+                insert(Message).returning(Message, sort_by_parameter_order=True),
+                [
+                    {
+                        "content": item.content,
+                        "sender_id": item.sender_id,
+                        "receiver_id": item.receiver_id,
+                        "conversation_id": conversation_ids[
+                            ConversationService.ordered_pair(item.sender_id, item.receiver_id)
+                        ],
+                        "created_at": item.created_at,
+                        "is_read": False
+                    }
+                    for item in valid
+                ]
+            )
+            messages = result.all()
+
+            # 수신자별 읽지 않은 메시지 수를 같은 트랜잭션에서 증가
+            await UnreadService.increment(
+                db, Counter((message.receiver_id, message.conversation_id) for message in messages)
+            )
+            # 두 참여자의 대화 목록에 마지막 메시지 반영
+            await ConversationService.update_summaries(db, messages)
+            await db.commit()
+
+        self.batches += 1
+        self.written += len(messages)
+        message_write_batch_size.observe(len(messages))
+        for item, message in zip(valid, messages):
+            if not item.future.done():
+                item.future.set_result(message)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            task = self._task
+            # 대기 중인 메시지(writer 가 이미 꺼낸 배치 포함)를 모두 저장한 뒤 종료하도록 신호
+            # 대기열이 가득 차 있어도 writer 가 비우는 중이므로 자리가 남
+            await self._queue.put(_STOP)
+            try:
+                await asyncio.wait_for(asyncio.shield(task), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Message writer did not finish within {self.stop_timeout}s, cancelling")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                # 저장하지 못한 메시지의 요청에 실패를 알림
+                remaining: List[_PendingMessage] = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        remaining.append(item)
+                self._fail(remaining, HTTPException(status_code=503, detail="Server is shutting down"))
+            self._task = None
+
+# 전역 메시지 저장 파이프라인 인스턴스 생성
+message_writer = MessageWriter()
+
+metrics.gauge("chat_message_write_queue_depth", "Messages waiting to be stored",
+              function=lambda: message_writer.pending)
+message_write_batch_size = metrics.histogram(
+    "chat_message_write_batch_size", "Messages stored per INSERT/commit",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
@@ -0,0 +1,216 @@
+from typing import Dict, Tuple, List, Callable, Optional, Sequence, Iterable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import bisect
+import math
+import threading
+
+# 기본 지연 시간 히스토그램 구간 (초)
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # 스레드 풀(bcrypt 등)에서 갱신될 수 있으므로 잠금 사용
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """증가만 하는 값 (요청 수 등)"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+
+class Gauge(_Metric):
+    """현재 값 - 직접 설정하거나, 수집 시점에 함수를 호출해 읽음"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        # 레이블이 없으면 숫자, 있으면 {레이블 값 튜플: 숫자} 를 반환하는 함수
+        self._function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self._function is not None:
+            value = self._function()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+
+class Histogram(_Metric):
+    """구간별 누적 분포 (지연 시간 등)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 레이블 값 -> [구간별 개수..., +Inf 개수], 합계
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        labelnames = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labelnames, key + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, total
+            yield f"{self.name}_count", self.labelnames, key, cumulative
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식(/metrics)으로 내보내는 메트릭 모음"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], object]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 전역 메트릭 레지스트리 인스턴스 생성
+metrics = MetricsRegistry()
+
+# HTTP API (라우트 템플릿 기준이라 경로 파라미터가 있어도 레이블 수가 늘지 않음)
+http_request_duration = metrics.histogram(
+    "chat_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")
+)
+
+# Socket.IO 이벤트
+socketio_events = metrics.counter(
+    "chat_socketio_events_total", "Socket.IO events handled", ("event", "outcome")
+)
+socketio_event_duration = metrics.histogram(
+    "chat_socketio_event_duration_seconds", "Socket.IO event handler latency", ("event",)
+)
+
+# bcrypt 작업 풀
+password_hash_wait = metrics.histogram(
+    "chat_password_hash_wait_seconds", "Time password hash jobs wait for a pool worker"
+)
+
+# 데이터베이스 커넥션 풀
+db_pool_checkouts = metrics.counter(
+    "chat_db_pool_checkouts_total", "Connections checked out of the SQLAlchemy pool", ("engine",)
+)
+db_pool_connects = metrics.counter(
+    "chat_db_pool_connections_opened_total", "New DBAPI connections opened by the SQLAlchemy pool", ("engine",)
+)
+_instrumented_pools: Dict[str, object] = {}
+
+def _pool_stat(stat: str) -> Callable[[], Dict[LabelValues, float]]:
+    def read():
+        values = {}
+        for engine_name, pool in _instrumented_pools.items():
+            method = getattr(pool, stat, None)
+            if method is not None:
+                values[(engine_name,)] = method()
+        return values
+    return read
+
+metrics.gauge("chat_db_pool_size", "Configured SQLAlchemy pool size", ("engine",), _pool_stat("size"))
+metrics.gauge("chat_db_pool_checked_out", "Connections currently checked out", ("engine",), _pool_stat("checkedout"))
+metrics.gauge("chat_db_pool_checked_in", "Idle connections in the pool", ("engine",), _pool_stat("checkedin"))
+metrics.gauge("chat_db_pool_overflow", "Connections opened beyond the pool size (negative while below)",
+              ("engine",), _pool_stat("overflow"))
+
+def instrument_engine(engine: Engine, name: str):
+    """엔진의 커넥션 풀 상태/체크아웃 수를 메트릭으로 노출 (비동기 엔진은 sync_engine 전달)"""
+    _instrumented_pools[name] = engine.pool
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts.inc(engine=name)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        db_pool_connects.inc(engine=name)
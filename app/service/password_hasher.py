@@ -0,0 +1,122 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+from app.service.metrics import metrics, password_hash_wait
+from typing import Optional, Callable, Any, Tuple
+import asyncio
+import bcrypt
+import logging
+import os
+import time
+
+# 로깅 설정
+logger = logging.getLogger("password_hasher")
+
+# 비밀번호 해싱 작업 풀 설정
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 실행 중 + 대기 중인 작업 최대 개수 (초과 시 503으로 즉시 거절)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+# bcrypt cost factor (변경 시 로그인할 때 자동으로 재해싱)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# 프로세스 풀에서도 실행할 수 있도록 모듈 수준 함수로 정의
+def _hash_password(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+def _check_password(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+def _run_timed(fn: Callable[..., Any], *args) -> Tuple[float, Any]:
+    """작업 시작 시각과 결과를 함께 반환 (대기 시간 측정용)"""
+    started_at = time.time()
+    return started_at, fn(*args)
+
+class PasswordHasher:
+    """
+    bcrypt 해싱/검증을 제한된 작업 풀에서 실행
+    - 이벤트 루프를 막지 않음
+    - 대기 작업이 max_pending 을 넘으면 503으로 거절하여 로그인 폭주 시에도 서버가 멈추지 않음
+    """
+
+    def __init__(self, executor_type: str = PASSWORD_HASH_EXECUTOR,
+                 workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.executor_type = executor_type
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        # 현재 풀에 들어가 있는 작업 수 (큐 깊이)
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        # 풀 대기 시간 누적 (초)
+        self.total_wait_time = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                # bcrypt는 해싱 중 GIL을 해제하므로 스레드 풀로도 병렬 처리 가능
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            logger.info(f"Password hash pool started ({self.executor_type}, workers={self.workers}, max_pending={self.max_pending})")
+        return self._executor
+
+    async def _submit(self, fn: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            password_hash_rejected.inc()
+            logger.warning(f"Password hash pool is full ({self.pending} pending), rejecting request")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again later",
+                headers={"Retry-After": "1"}
+            )
+
+        self.pending += 1
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            started_at, result = await loop.run_in_executor(self._get_executor(), _run_timed, fn, *args)
+            wait_time = max(0.0, started_at - submitted_at)
+            self.completed += 1
+            self.total_wait_time += wait_time
+            password_hash_wait.observe(wait_time)
+            return result
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(_hash_password, password.encode('utf-8'), self.rounds)
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_check_password, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    @property
+    def saturated(self) -> bool:
+        """모든 작업자가 사용 중이면 True (재해싱 같은 선택적 작업은 건너뜀)"""
+        return self.pending >= min(self.workers, self.max_pending)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """저장된 해시의 cost factor가 현재 설정과 다르면 True ($2b$<rounds>$...)"""
+        try:
+            return int(hashed_password.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# 전역 비밀번호 해셔 인스턴스 생성
+password_hasher = PasswordHasher()
+
+metrics.gauge("chat_password_hash_pending", "Password hash jobs running or waiting in the pool",
+              function=lambda: password_hasher.pending)
+password_hash_rejected = metrics.counter(
+    "chat_password_hash_rejected_total", "Password hash jobs rejected because the pool was full"
+)
@@ -0,0 +1,229 @@
+from sqlalchemy import select
+from app.config.database import AsyncSessionLocal
+from app.models.contact import Contact
+from typing import Dict, Set, List, Callable, Awaitable, Any, Optional
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+# 로깅 설정
+logger = logging.getLogger("presence")
+
+# 연결이 끊긴 뒤 오프라인으로 처리하기까지 기다리는 시간 (초) - 이 안에 재접속하면 알림 없음
+PRESENCE_GRACE_PERIOD = float(os.getenv("PRESENCE_GRACE_PERIOD", "5"))
+# 상태 변경을 모아서 전송하는 주기 (초)
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "2"))
+# 다른 워커에 이 워커의 전체 접속자 목록을 다시 알리는 주기 (초)
+# 3 주기 동안 소식이 없는 워커(비정상 종료 등)의 사용자는 오프라인으로 처리
+PRESENCE_SYNC_INTERVAL = float(os.getenv("PRESENCE_SYNC_INTERVAL", "30"))
+
+# (수신자 ID, 다이제스트) 를 받아 실제로 전송하는 함수
+PresenceSink = Callable[[int, Dict[str, Any]], Awaitable[Any]]
+# 이 워커의 접속 상태 변경을 다른 워커에 알리는 함수 (메시지 버스)
+PresencePublisher = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class PresenceManager:
+    """
+    접속 상태 변경을 연락처에 등록한 사용자에게만 알림
+    - 사용자별 연결 수를 세어 여러 연결/전송 방식이 있어도 마지막 연결이 끊길 때만 오프라인 처리
+    - 끊긴 뒤 grace_period 안에 재접속하면 아무 알림도 보내지 않음 (flapping 방지)
+    - 변경 사항은 flush_interval 마다 수신자별 다이제스트({"online": [...], "offline": [...]})로 묶어서 전송
+    - 여러 워커: 워커마다 자기 접속자 목록의 변경을 publisher 로 알리고 다른 워커의 목록을 apply_remote 로 받음
+      모든 워커가 같은 전체 접속 상태를 계산하고, 다이제스트는 각자 자기에게 연결된 수신자에게만 보냄
+    """
+
+    def __init__(self, grace_period: float = PRESENCE_GRACE_PERIOD,
+                 flush_interval: float = PRESENCE_FLUSH_INTERVAL,
+                 sync_interval: float = PRESENCE_SYNC_INTERVAL):
+        self.grace_period = grace_period
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.host_id = uuid.uuid4().hex
+        # 이 워커의 사용자별 연결 수
+        self._connections: Dict[int, int] = {}
+        # 다른 워커(host_id)별 접속자와 마지막으로 소식을 받은 시각
+        self._remote: Dict[str, Set[int]] = {}
+        self._remote_seen: Dict[str, float] = {}
+        # 다른 워커에 마지막으로 알린 이 워커의 접속자
+        self._announced: Set[int] = set()
+        self._next_sync = 0.0
+        self._publisher: Optional[PresencePublisher] = None
+        self._online: Set[int] = set()
+        self._offline_deadlines: Dict[int, float] = {}
+        # 아직 알리지 않은 변경 사항 (True: 온라인, False: 오프라인)
+        self._changes: Dict[int, bool] = {}
+        self._sinks: List[PresenceSink] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_sink(self, sink: PresenceSink):
+        self._sinks.append(sink)
+
+    def set_publisher(self, publisher: PresencePublisher):
+        self._publisher = publisher
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._online
+
+    def _is_connected(self, user_id: int) -> bool:
+        """어느 워커에든 연결이 남아 있는지"""
+        return user_id in self._connections or any(user_id in users for users in self._remote.values())
+
+    def user_connected(self, user_id: int):
+        self._connections[user_id] = self._connections.get(user_id, 0) + 1
+        self._mark_connected(user_id)
+
+    def _mark_connected(self, user_id: int):
+        # grace 기간 안의 재접속이면 오프라인 처리 취소
+        self._offline_deadlines.pop(user_id, None)
+        if user_id not in self._online:
+            self._online.add(user_id)
+            if self._changes.get(user_id) is False:
+                # 오프라인 알림이 나가기 전에 돌아옴 - 서로 상쇄
+                del self._changes[user_id]
+            else:
+                self._changes[user_id] = True
+
+    def user_disconnected(self, user_id: int):
+        count = self._connections.get(user_id, 0) - 1
+        if count > 0:
+            self._connections[user_id] = count
+            return
+        self._connections.pop(user_id, None)
+        self._mark_disconnected(user_id)
+
+    def _mark_disconnected(self, user_id: int):
+        if user_id in self._online and not self._is_connected(user_id):
+            self._offline_deadlines[user_id] = time.monotonic() + self.grace_period
+
+    def apply_remote(self, update: Dict[str, Any]):
+        """
+        다른 워커의 접속자 변경 반영
+        {"host": ..., "users": [...]} 는 전체 목록, {"host": ..., "online": [...], "offline": [...]} 는 변경분
+        """
+        host = update["host"]
+        if host == self.host_id:
+            return
+        current = self._remote.get(host, set())
+        if "users" in update:
+            users = set(update["users"])
+        else:
+            users = (current | set(update.get("online", ()))) - set(update.get("offline", ()))
+        self._set_remote(host, users)
+        if users:
+            self._remote_seen[host] = time.monotonic()
+
+    def _set_remote(self, host: str, users: Set[int]):
+        current = self._remote.get(host, set())
+        if users:
+            self._remote[host] = users
+        else:
+            self._remote.pop(host, None)
+            self._remote_seen.pop(host, None)
+        for user_id in users - current:
+            self._mark_connected(user_id)
+        for user_id in current - users:
+            self._mark_disconnected(user_id)
+
+    def _expire_remote(self):
+        """소식이 끊긴 워커의 접속자 제거"""
+        cutoff = time.monotonic() - 3 * self.sync_interval
+        for host in [host for host, seen in self._remote_seen.items() if seen < cutoff]:
+            logger.warning(f"No presence updates from worker {host}, treating its users as offline")
+            self._set_remote(host, set())
+
+    async def _announce(self, final: bool = False):
+        """이 워커의 접속자 변경분(주기적으로는 전체 목록)을 다른 워커에 알림"""
+        if self._publisher is None:
+            return
+        local = set() if final else set(self._connections)
+        now = time.monotonic()
+        if final or now >= self._next_sync:
+            update = {"host": self.host_id, "users": list(local)}
+            self._next_sync = now + self.sync_interval
+        elif local != self._announced:
+            update = {"host": self.host_id, "online": list(local - self._announced),
+                      "offline": list(self._announced - local)}
+        else:
+            return
+        await self._publisher(update)
+        self._announced = local
+
+    def _expire_offline(self):
+        now = time.monotonic()
+        expired = [user_id for user_id, deadline in self._offline_deadlines.items() if deadline <= now]
+        for user_id in expired:
+            del self._offline_deadlines[user_id]
+            if self._is_connected(user_id):
+                continue
+            self._online.discard(user_id)
+            if self._changes.get(user_id) is True:
+                # 온라인 알림이 나가기 전에 다시 나감 - 서로 상쇄
+                del self._changes[user_id]
+            else:
+                self._changes[user_id] = False
+
+    async def flush(self):
+        try:
+            await self._announce()
+        except Exception as e:
+            logger.error(f"Failed to publish presence changes: {str(e)}")
+        self._expire_remote()
+        self._expire_offline()
+        if not self._changes:
+            return
+        changes, self._changes = self._changes, {}
+
+        # 변경된 사용자를 연락처에 등록한 사용자 조회 (한 번의 쿼리)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Contact.user_id, Contact.contact_id).filter(Contact.contact_id.in_(list(changes)))
+            )
+            rows = result.all()
+
+        # 다른 워커도 같은 변경을 계산하므로 이 워커에 연결된 수신자에게만 보냄
+        digests: Dict[int, Dict[str, List[int]]] = {}
+        for watcher_id, contact_id in rows:
+            if watcher_id not in self._connections:
+                continue
+            digest = digests.setdefault(watcher_id, {"online": [], "offline": []})
+            digest["online" if changes[contact_id] else "offline"].append(contact_id)
+
+        for watcher_id, digest in digests.items():
+            for sink in self._sinks:
+                try:
+                    await sink(watcher_id, digest)
+                except Exception as e:
+                    logger.error(f"Failed to send presence update to user {watcher_id}: {str(e)}")
+
+        logger.debug(f"Presence digest: {len(changes)} changes sent to {len(digests)} watchers")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence flush failed: {str(e)}", exc_info=True)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # 종료하는 워커의 접속자를 다른 워커가 바로 오프라인 처리하도록 알림
+            try:
+                await self._announce(final=True)
+            except Exception as e:
+                logger.error(f"Failed to publish presence on shutdown: {str(e)}")
+
+# 전역 접속 상태 관리자 인스턴스 생성
+presence_manager = PresenceManager()
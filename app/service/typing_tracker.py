@@ -0,0 +1,90 @@
+from typing import Dict, Tuple, List, Callable, Awaitable, Any, Optional
+import asyncio
+import logging
+import os
+import time
+
+# 로깅 설정
+logger = logging.getLogger("typing")
+
+# 대화별로 typing 이벤트를 다시 전달하기까지의 최소 간격 (초)
+TYPING_THROTTLE = float(os.getenv("TYPING_THROTTLE", "3"))
+# 마지막 typing 이벤트 이후 이 시간이 지나면 typing_stopped 자동 전송 (초)
+TYPING_TIMEOUT = float(os.getenv("TYPING_TIMEOUT", "5"))
+# 만료 확인 주기 (초)
+TYPING_SWEEP_INTERVAL = float(os.getenv("TYPING_SWEEP_INTERVAL", "1"))
+
+# (발신자 ID, 수신자 ID) 를 받아 typing_stopped 를 전송하는 함수
+TypingStoppedSink = Callable[[int, int], Awaitable[Any]]
+
+class TypingTracker:
+    """
+    서버에서 대화별 입력 중 상태를 관리
+    - 입력 시작은 throttle 간격마다 최대 한 번만 전달
+    - timeout 동안 typing 이벤트가 없으면 typing_stopped 를 한 번 전달
+    활성 대화당 전송량이 키 입력 속도와 무관하게 일정
+    """
+
+    def __init__(self, throttle: float = TYPING_THROTTLE, timeout: float = TYPING_TIMEOUT,
+                 sweep_interval: float = TYPING_SWEEP_INTERVAL):
+        self.throttle = throttle
+        self.timeout = timeout
+        self.sweep_interval = sweep_interval
+        # (sender, receiver) -> [마지막으로 전달한 시각, 만료 시각]
+        self._active: Dict[Tuple[int, int], List[float]] = {}
+        self._sinks: List[TypingStoppedSink] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_sink(self, sink: TypingStoppedSink):
+        self._sinks.append(sink)
+
+    def typing(self, sender_id: int, receiver_id: int) -> bool:
+        """typing 이벤트 기록. 수신자에게 전달해야 하면 True"""
+        now = time.monotonic()
+        key = (sender_id, receiver_id)
+        state = self._active.get(key)
+        if state is None:
+            self._active[key] = [now, now + self.timeout]
+            return True
+        state[1] = now + self.timeout
+        if now - state[0] >= self.throttle:
+            state[0] = now
+            return True
+        return False
+
+    def clear(self, sender_id: int, receiver_id: int) -> bool:
+        """입력 종료 (메시지 전송 등). 입력 중이었으면 True"""
+        return self._active.pop((sender_id, receiver_id), None) is not None
+
+    def expire(self) -> List[Tuple[int, int]]:
+        now = time.monotonic()
+        expired = [key for key, state in self._active.items() if state[1] <= now]
+        for key in expired:
+            del self._active[key]
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            for sender_id, receiver_id in self.expire():
+                for sink in self._sinks:
+                    try:
+                        await sink(sender_id, receiver_id)
+                    except Exception as e:
+                        logger.error(f"Failed to send typing_stopped to user {receiver_id}: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# 전역 입력 상태 관리자 인스턴스 생성
+typing_tracker = TypingTracker()
@@ -0,0 +1,71 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from app.models.conversation import Conversation
+from app.models.unread_counter import UnreadCounter
+from datetime import datetime
+from typing import Dict, Tuple, List, Any
+
+class UnreadService:
+    """
+    (사용자, 대화)별 읽지 않은 메시지 수를 미리 계산해 저장
+    메시지 저장/읽음 처리와 같은 트랜잭션에서 갱신하므로 조회 비용은 대화 수에 비례
+    (commit은 호출한 쪽에서 처리)
+    """
+
+    @staticmethod
+    async def increment(db: AsyncSession, counts: Dict[Tuple[int, int], int]):
+        """{(user_id, conversation_id): 증가량} 을 한 번의 upsert 로 반영"""
+        if not counts:
+            return
+        now = datetime.utcnow()
+        # 항상 같은 키 순서로 행을 잠가, 동시에 실행되는 배치끼리 교착 상태가 생기지 않도록 정렬
+        stmt = insert(UnreadCounter).values([
+            {"user_id": user_id, "conversation_id": conversation_id, "unread_count": count, "updated_at": now}
+            for (user_id, conversation_id), count in sorted(counts.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UnreadCounter.user_id, UnreadCounter.conversation_id],
+            set_={
+                "unread_count": UnreadCounter.unread_count + stmt.excluded.unread_count,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def decrement(db: AsyncSession, user_id: int, conversation_id: int, count: int):
+        """읽음 처리된 메시지 수만큼 감소 (0 미만으로 내려가지 않음)"""
+        if count <= 0 or conversation_id is None:
+            return
+        await db.execute(
+            update(UnreadCounter)
+            .where(UnreadCounter.user_id == user_id, UnreadCounter.conversation_id == conversation_id)
+            .values(
+                unread_count=func.greatest(UnreadCounter.unread_count - count, 0),
+                updated_at=datetime.utcnow()
+            )
+        )
+
+    @staticmethod
+    async def get_unread_counts(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+        """읽지 않은 메시지가 있는 대화 목록 (대화 상대 ID 포함)"""
+        result = await db.execute(
+            select(
+                UnreadCounter.conversation_id,
+                UnreadCounter.unread_count,
+                Conversation.user_low_id,
+                Conversation.user_high_id
+            )
+            .join(Conversation, Conversation.id == UnreadCounter.conversation_id)
+            .filter(UnreadCounter.user_id == user_id, UnreadCounter.unread_count > 0)
+            .order_by(UnreadCounter.conversation_id)
+        )
+        return [
+            {
+                "conversation_id": conversation_id,
+                "other_user_id": user_high_id if user_id == user_low_id else user_low_id,
+                "unread_count": unread_count
+            }
+            for conversation_id, unread_count, user_low_id, user_high_id in result
+        ]
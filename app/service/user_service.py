@@ -1,30 +1,87 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 from fastapi import HTTPException
+from app.config.database import AsyncSessionLocal
 from app.models.user import User
-import bcrypt
-from typing import Dict, Any
+from app.service.password_hasher import password_hasher
+from app.service.lru_cache import LRUCache
+from app.service.metrics import metrics
+import logging
+import os
+from typing import Dict, Any, Iterable, Optional
+
+# 사용자 존재 확인용 캐시 (ID -> id/username/email)
+# 사용자 생성 시 갱신, 다른 워커의 변경은 TTL 이후 반영. 존재하지 않는 ID는 캐시하지 않음
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+class CachedUser:
+    """캐시에 보관하는 사용자 정보 (비밀번호 해시 등은 제외)"""
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id: int, username: str, email: str):
+        self.id = id
+        self.username = username
+        self.email = email
 
 
 class UserService:
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int):
-        user = db.query(User).filter(User.id == user_id).first()
+    async def get_cached_users(db: Optional[AsyncSession], user_ids: Iterable[int]) -> Dict[int, CachedUser]:
+        """
+        사용자 ID -> CachedUser (존재하지 않는 ID는 결과에 없음)
+        캐시에 없는 ID만 한 번의 쿼리로 조회. db 가 None 이면 조회가 필요할 때만 세션을 열어 사용
+        """
+        found: Dict[int, CachedUser] = {}
+        missing = []
+        for user_id in set(user_ids):
+            cached = user_cache.get(user_id)
+            if cached is not None:
+                found[user_id] = cached
+            else:
+                missing.append(user_id)
+        user_cache_lookups.inc(len(found), result="hit")
+        if not missing:
+            return found
+        user_cache_lookups.inc(len(missing), result="miss")
+
+        query = select(User.id, User.username, User.email).filter(User.id.in_(missing))
+        if db is not None:
+            rows = (await db.execute(query)).all()
+        else:
+            async with AsyncSessionLocal() as session:
+                rows = (await session.execute(query)).all()
+        for row in rows:
+            cached = CachedUser(row.id, row.username, row.email)
+            user_cache.set(row.id, cached)
+            found[row.id] = cached
+        return found
+
+    @staticmethod
+    async def get_cached_user(db: Optional[AsyncSession], user_id: int) -> Optional[CachedUser]:
+        return (await UserService.get_cached_users(db, (user_id,))).get(user_id)
+
+    @staticmethod
+    async def get_user_by_id(db: AsyncSession, user_id: int):
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
 
     @staticmethod
-    def get_user_by_email(db: Session, email: str):
-        return db.query(User).filter(User.email == email).first()
+    async def get_user_by_email(db: AsyncSession, email: str):
+        result = await db.execute(select(User).filter(User.email == email))
+        return result.scalars().first()
 
     @staticmethod
-    def create_user(db: Session, email: str, username: str, password: str) -> User:
+    async def create_user(db: AsyncSession, email: str, username: str, password: str) -> User:
         # 이메일 중복 확인
-        if UserService.get_user_by_email(db, email):
+        if await UserService.get_user_by_email(db, email):
             raise HTTPException(status_code=400, detail="Email already exists")
         
         # 비밀번호 해싱
-        hashed_password = UserService.hash_password(password)
+        hashed_password = await UserService.hash_password(password)
         
         # 새 사용자 생성
         new_user = User(
@@ -33,35 +90,57 @@ class UserService:
             password=hashed_password
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        # 이전에 같은 ID로 남아 있던 항목을 새 사용자 정보로 교체
+        user_cache.set(new_user.id, CachedUser(new_user.id, new_user.username, new_user.email))
         return new_user
 
     @staticmethod
-    def verify_user_credentials(db: Session, email: str, password: str) -> User:
-        user = UserService.get_user_by_email(db, email)
+    async def verify_user_credentials(db: AsyncSession, email: str, password: str) -> User:
+        user = await UserService.get_user_by_email(db, email)
         if not user:
             raise HTTPException(status_code=400, detail="User not found")
         
-        if not UserService.verify_password(password, user.password):
+        if not await UserService.verify_password(password, user.password):
             raise HTTPException(status_code=400, detail="Invalid password")
         
+        # cost factor가 변경된 경우 로그인 시 새 설정으로 재해싱
+        # 해싱 풀이 포화 상태면 건너뜀 (다음 로그인 때 다시 시도)
+        if password_hasher.needs_rehash(user.password) and not password_hasher.saturated:
+            await UserService._rehash_password(user.id, user.password, password)
+        
         return user
 
     @staticmethod
-    def hash_password(password: str) -> str:
-        # 비밀번호를 바이트로 변환
-        password_bytes = password.encode('utf-8')
-        # 솔트 생성 및 비밀번호 해싱
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password_bytes, salt)
-        # 해시된 비밀번호를 문자열로 변환하여 반환
-        return hashed.decode('utf-8')
+    async def _rehash_password(user_id: int, old_hash: str, password: str):
+        """
+        별도의 짧은 세션에서 UPDATE 로 비밀번호 해시 교체
+        요청 세션은 commit/rollback 하지 않으므로 로그인 응답에 쓰는 user 객체가 만료되지 않음
+        """
+        try:
+            new_hash = await UserService.hash_password(password)
+            async with AsyncSessionLocal() as session:
+                # 그 사이 다른 요청이 이미 바꿨으면 덮어쓰지 않음
+                await session.execute(
+                    update(User).where(User.id == user_id, User.password == old_hash).values(password=new_hash)
+                )
+                await session.commit()
+        except Exception as e:
+            # 재해싱 실패는 로그인 결과에 영향을 주지 않도록 함
+            logging.error(f"Failed to rehash password for user {user_id}: {str(e)}")
 
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        # 입력된 비밀번호와 해시된 비밀번호를 바이트로 변환
-        plain_password_bytes = plain_password.encode('utf-8')
-        hashed_password_bytes = hashed_password.encode('utf-8')
-        # 비밀번호 검증
-        return bcrypt.checkpw(plain_password_bytes, hashed_password_bytes) 
\ No newline at end of file
+    async def hash_password(password: str) -> str:
+        # bcrypt 해싱은 CPU 작업이므로 작업 풀에서 실행
+        return await password_hasher.hash(password)
+
+    @staticmethod
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        # 비밀번호 검증도 작업 풀에서 실행
+        return await password_hasher.verify(plain_password, hashed_password) 
+
+user_cache_lookups = metrics.counter(
+    "chat_user_cache_lookups_total", "User existence cache lookups", ("result",)
+)
+metrics.gauge("chat_user_cache_size", "Users held in the user cache", function=lambda: len(user_cache))
@@ -1,105 +1,197 @@
 from fastapi import WebSocket, status
+from app.service.metrics import metrics
+from app.service.message_serializer import dumps
 from typing import Dict, List, Optional
+import asyncio
 import json
 import logging
+import os
 
 # 로깅 설정
 logger = logging.getLogger("websocket")
 
+# 연결별 송신 대기열 최대 길이
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# 메시지 하나를 보내는 데 허용하는 최대 시간 (초) - 넘으면 느린 클라이언트로 보고 연결 종료
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+# 대기열이 가득 찼을 때의 처리: evict (연결 종료, 재접속 시 DB에서 다시 전달) / drop (새 메시지 버림)
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "evict")
+
+class _Connection:
+    """웹소켓 연결 하나와 그 연결의 송신 대기열/전송 작업"""
+    __slots__ = ("websocket", "user_id", "queue", "task")
+
+    def __init__(self, websocket: WebSocket, user_id: int, max_queue: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+
 class WebSocketManager:
-    def __init__(self):
-        # 사용자 ID를 키로, WebSocket 연결을 값으로 저장
-        self.active_connections: Dict[int, WebSocket] = {}
-        # 각 사용자의 메시지 큐
-        self.message_queues: Dict[int, List[dict]] = {}
+    """
+    웹소켓 연결 관리
+    연결마다 크기가 제한된 송신 대기열과 전용 전송 작업을 두고, 전송/브로드캐스트는 대기열에 넣기만 함
+    느린 클라이언트 하나가 다른 사용자에게 가는 전송을 막지 않음
+    """
+
+    def __init__(self, max_queue: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT,
+                 policy: str = WS_SLOW_CONSUMER_POLICY):
+        if policy not in ("evict", "drop"):
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.policy = policy
+        # 사용자 ID를 키로, 연결 정보를 값으로 저장
+        self._connections: Dict[int, _Connection] = {}
         logger.info("WebSocketManager initialized")
 
+    @property
+    def active_connections(self) -> Dict[int, WebSocket]:
+        """사용자 ID -> WebSocket"""
+        return {user_id: connection.websocket for user_id, connection in self._connections.items()}
+
+    def queue_depths(self) -> List[int]:
+        """연결별 송신 대기열 길이"""
+        return [connection.queue.qsize() for connection in self._connections.values()]
+
     async def connect(self, websocket: WebSocket, user_id: int) -> bool:
         """
         사용자 웹소켓 연결 등록
         이미 연결된 경우 기존 연결 종료 후 새 연결 등록
         """
         # 이미 연결된 경우 연결 해제
-        if user_id in self.active_connections:
+        existing = self._connections.get(user_id)
+        if existing is not None:
+            logger.info(f"Closing existing connection for user {user_id}")
+            self.disconnect(user_id)
+            await self._close(existing.websocket, status.WS_1000_NORMAL_CLOSURE, "New connection established")
+
+        # 새 연결 등록 및 전송 작업 시작
+        connection = _Connection(websocket, user_id, self.max_queue)
+        connection.task = asyncio.create_task(self._writer(connection))
+        self._connections[user_id] = connection
+
+        logger.info(f"User {user_id} connected. Active connections: {len(self._connections)}")
+        return True
+
+    def disconnect(self, user_id: int, websocket: Optional[WebSocket] = None) -> bool:
+        """사용자 연결 해제 (websocket 을 지정하면 해당 연결일 때만 해제)"""
+        connection = self._connections.get(user_id)
+        if connection is None or (websocket is not None and connection.websocket is not websocket):
+            return False
+        del self._connections[user_id]
+        if connection.task is not None and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+        # 보내지 못한 메시지 정리 (flush 대기 해제)
+        while True:
+            try:
+                connection.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            connection.queue.task_done()
+        logger.info(f"User {user_id} disconnected. Active connections: {len(self._connections)}")
+        return True
+
+    async def _close(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            # 상대가 응답하지 않아도 종료 처리가 멈추지 않도록 시간 제한
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), self.send_timeout)
+        except Exception as e:
+            logger.error(f"Error closing connection: {str(e)}")
+
+    def _evict(self, connection: _Connection, reason: str):
+        """느린 클라이언트 연결 종료 - 보내지 못한 메시지는 재접속 시 DB에서 다시 전달됨"""
+        if self.disconnect(connection.user_id, connection.websocket):
+            logger.warning(f"Evicting slow websocket consumer {connection.user_id}: {reason}")
+            websocket_evictions.inc(reason=reason)
+            asyncio.create_task(self._close(connection.websocket, status.WS_1013_TRY_AGAIN_LATER, "Slow consumer"))
+
+    async def _writer(self, connection: _Connection):
+        """연결 하나의 대기열을 순서대로 전송"""
+        while True:
+            message = await connection.queue.get()
             try:
-                logger.info(f"Closing existing connection for user {user_id}")
-                await self.active_connections[user_id].close(
-                    code=status.WS_1000_NORMAL_CLOSURE,
-                    reason="New connection established"
-                )
+                await asyncio.wait_for(connection.websocket.send_text(dumps(message).decode("utf-8")), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(connection, "send_timeout")
+                return
             except Exception as e:
-                logger.error(f"Error closing existing connection: {str(e)}")
+                logger.error(f"Error sending message to user {connection.user_id}: {str(e)}")
+                self._evict(connection, "send_error")
+                return
             finally:
-                self.disconnect(user_id)
-
-        # 새 연결 등록
-        self.active_connections[user_id] = websocket
-        # 새로운 연결이 생성될 때 메시지 큐 초기화
-        if user_id not in self.message_queues:
-            self.message_queues[user_id] = []
-            
-        logger.info(f"User {user_id} connected. Active connections: {len(self.active_connections)}")
-        return True
+                connection.queue.task_done()
 
-    def disconnect(self, user_id: int) -> bool:
-        """사용자 연결 해제"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            logger.info(f"User {user_id} disconnected. Active connections: {len(self.active_connections)}")
+    def _enqueue(self, connection: _Connection, message: dict) -> bool:
+        try:
+            connection.queue.put_nowait(message)
             return True
-        return False
+        except asyncio.QueueFull:
+            if self.policy == "drop":
+                websocket_dropped_messages.inc()
+            else:
+                self._evict(connection, "queue_full")
+            return False
+
+    async def send(self, websocket: WebSocket, user_id: int, message: dict) -> bool:
+        """
+        연결 자신의 처리 흐름에서 보내는 메시지 (재접속 시 밀린 메시지 등)
+        대기열에 자리가 날 때까지 기다림 - 다른 연결에는 영향 없음
+        """
+        connection = self._connections.get(user_id)
+        if connection is None or connection.websocket is not websocket:
+            return False
+        await connection.queue.put(message)
+        # 기다리는 동안 연결이 종료되었을 수 있음
+        return self._connections.get(user_id) is connection
+
+    async def flush(self, websocket: WebSocket, user_id: int) -> bool:
+        """대기열의 메시지가 모두 전송될 때까지 대기. 그 사이 연결이 종료되면 False"""
+        connection = self._connections.get(user_id)
+        if connection is None or connection.websocket is not websocket:
+            return False
+        await connection.queue.join()
+        return self._connections.get(user_id) is connection
 
     async def send_personal_message(self, message: dict, user_id: int) -> bool:
         """
-        특정 사용자에게 메시지 전송
-        사용자가 오프라인이면 큐에 저장
+        특정 사용자에게 메시지 전송 (대기열에 넣기만 하고 기다리지 않음)
+        사용자가 오프라인이면 False 반환 (메시지는 DB에 저장되어 있으므로 재접속 시 전달)
         """
-        try:
-            if user_id in self.active_connections:
-                await self.active_connections[user_id].send_json(message)
-                logger.info(f"Message sent to user {user_id}")
-                return True
-            else:
-                # 사용자가 오프라인인 경우 메시지를 큐에 저장
-                if user_id not in self.message_queues:
-                    self.message_queues[user_id] = []
-                self.message_queues[user_id].append(message)
-                logger.info(f"Message queued for offline user {user_id}")
-                return False
-        except Exception as e:
-            logger.error(f"Error sending message to user {user_id}: {str(e)}")
+        connection = self._connections.get(user_id)
+        if connection is None:
             return False
+        return self._enqueue(connection, message)
 
     async def broadcast(self, message: dict) -> int:
-        """모든 연결된 클라이언트에게 메시지 전송. 전송 성공 개수 반환"""
+        """모든 연결된 클라이언트의 대기열에 메시지 추가. 추가된 연결 수 반환"""
         success_count = 0
-        for user_id, connection in list(self.active_connections.items()):
-            try:
-                await connection.send_json(message)
+        for connection in list(self._connections.values()):
+            if self._enqueue(connection, message):
                 success_count += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to user {user_id}: {str(e)}")
-                # 전송 실패한 연결은 제거
-                self.disconnect(user_id)
-        logger.info(f"Broadcast message sent to {success_count} connections")
+        logger.info(f"Broadcast message queued for {success_count} connections")
         return success_count
 
-    def get_queued_messages(self, user_id: int) -> List[dict]:
-        """사용자의 큐에 있는 메시지를 가져오고 큐 비우기"""
-        if user_id in self.message_queues:
-            messages = self.message_queues[user_id]
-            logger.info(f"Retrieved {len(messages)} queued messages for user {user_id}")
-            self.message_queues[user_id] = []  # 큐 비우기
-            return messages
-        return []
-    
     def is_user_online(self, user_id: int) -> bool:
         """사용자가 온라인 상태인지 확인"""
-        return user_id in self.active_connections
+        return user_id in self._connections
 
     def get_active_users_count(self) -> int:
         """현재 연결된 사용자 수 반환"""
-        return len(self.active_connections)
+        return len(self._connections)
 
 # 전역 웹소켓 매니저 인스턴스 생성
-manager = WebSocketManager() 
\ No newline at end of file
+manager = WebSocketManager()
+
+metrics.gauge("chat_websocket_connections", "Raw websocket connections on this worker",
+              function=manager.get_active_users_count)
+metrics.gauge("chat_websocket_send_queue_depth", "Messages waiting in websocket send queues",
+              function=lambda: sum(manager.queue_depths()))
+metrics.gauge("chat_websocket_send_queue_max_depth", "Longest websocket send queue",
+              function=lambda: max(manager.queue_depths(), default=0))
+websocket_evictions = metrics.counter(
+    "chat_websocket_evictions_total", "Websocket connections closed as slow consumers", ("reason",)
+)
+websocket_dropped_messages = metrics.counter(
+    "chat_websocket_dropped_messages_total", "Messages dropped because a websocket send queue was full"
+)
@@ -1,24 +1,36 @@
 import socketio
-from fastapi import Depends
-from sqlalchemy.orm import Session
-from app.config.database import get_db
-from app.models.user import User
-from app.models.message import Message
+from fastapi import HTTPException
+from app.config.database import AsyncSessionLocal
 from app.service.message_service import MessageService
+from app.service.message_bus import create_client_manager
+from app.service.delivery_service import DeliveryService, delivery_tracker
+from app.service.presence import presence_manager
+from app.service.typing_tracker import typing_tracker
+from app.service.auth_timeouts import auth_timeouts
+from app.service.connection_registry import connection_registry
+from app.service.message_writer import message_writer
+from app.service.unread_service import UnreadService
+from app.service.user_service import UserService
+from app.service.metrics import metrics, socketio_events, socketio_event_duration
+from app.service.message_serializer import SocketIOJSON
 from datetime import datetime
 import logging
 import json
 from typing import Dict, List, Any, Optional, Set
 import asyncio
+import functools
+import time
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("socketio")
 
-# Create Socket.IO server
+# Create Socket.IO server (client manager decides how events reach other workers)
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=create_client_manager(),
     cors_allowed_origins=['http://localhost:3000', 'http://localhost:8000', '*'],  # Explicitly add localhost:3000
+    json=SocketIOJSON,  # orjson-backed packet encoding
     logger=logger,
     engineio_logger=logger
 )
@@ -29,47 +41,48 @@ socket_app = socketio.ASGIApp(
     socketio_path='socket.io'
 )
 
-# User connection information
-connected_users: Dict[str, str] = {}  # user_id -> sid
-user_sids: Dict[str, str] = {}  # sid -> user_id
-message_queues: Dict[str, List[Dict[str, Any]]] = {}  # user_id -> [message objects]
-
-# Global DB session
-_db_session = None
-
-# Connection time records
-connection_times: Dict[str, datetime] = {}
-
-# Authentication timeout setting (in seconds)
-AUTH_TIMEOUT = 30
-
-def get_session():
-    # In actual use, it's better to use FastAPI dependency injection,
-    # but for Socket.IO we create and use it directly.
-    global _db_session
-    if _db_session is None:
-        # Note: This method is for development only. Production needs separate session management
-        from app.config.database import SessionLocal
-        _db_session = SessionLocal()
-    return _db_session
-
-# Authentication timeout check function
-async def check_auth_timeout(sid):
-    """Check authentication timeout - disconnect unauthenticated connections after a certain time"""
-    try:
-        await asyncio.sleep(AUTH_TIMEOUT)
-        # Timeout while unauthenticated
-        if sid in connection_times and sid not in user_sids:
-            connect_time = connection_times[sid]
-            current_time = datetime.utcnow()
-            time_diff = (current_time - connect_time).total_seconds()
-            
-            if time_diff >= AUTH_TIMEOUT:
-                logger.warning(f"Authentication timeout for {sid} after {time_diff:.1f}s. Disconnecting.")
-                await sio.emit('error', {'message': 'Authentication timeout'}, room=sid)
-                await sio.disconnect(sid)
-    except Exception as e:
-        logger.error(f"Error in auth timeout check for {sid}: {str(e)}")
+def tracked_event(handler):
+    """Count and time an event handler; a returned {'status': 'error'} counts as an error"""
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        started_at = time.perf_counter()
+        outcome = 'ok'
+        try:
+            result = await handler(*args)
+            if isinstance(result, dict) and result.get('status') == 'error':
+                outcome = 'error'
+            return result
+        except Exception:
+            outcome = 'exception'
+            raise
+        finally:
+            socketio_events.inc(event=handler.__name__, outcome=outcome)
+            socketio_event_duration.observe(time.perf_counter() - started_at, event=handler.__name__)
+    return wrapper
+
+async def emit_error(sid: str, message: str) -> Dict[str, Any]:
+    """Send an error event to the client; the returned ack also marks the event as failed in metrics"""
+    await sio.emit('error', {'message': message}, room=sid)
+    return {'status': 'error', 'message': message}
+
+def user_room(user_id) -> str:
+    """Per-user room name; events sent here reach the user on any worker"""
+    return f"user:{user_id}"
+
+# Bus-only room for presence updates between workers; no client ever joins it
+PRESENCE_ROOM = '__presence__'
+
+# Close connections that did not authenticate in time (called in bulk by the sweeper)
+async def close_unauthenticated(sids: List[str]):
+    """Disconnect unauthenticated connections whose authentication deadline has passed"""
+    async def close(sid):
+        if connection_registry.user_id(sid) is not None:
+            return
+        await sio.emit('error', {'message': 'Authentication timeout'}, room=sid)
+        await sio.disconnect(sid)
+    await asyncio.gather(*(close(sid) for sid in sids), return_exceptions=True)
+
+auth_timeouts.add_sink(close_unauthenticated)
 
 # Connection event
 @sio.event
@@ -80,37 +93,29 @@ async def connect(sid, environ):
     logger.info(f"Client connected: {sid} from {remote_addr} using {http_user_agent}")
     logger.debug(f"Connection details: {environ}")
     
-    # Record connection time (for authentication timeout tracking)
-    connection_times[sid] = datetime.utcnow()
-    
-    # Activate authentication timeout check
-    asyncio.create_task(check_auth_timeout(sid))
+    # Start the authentication deadline (expired in bulk by a single sweeper task)
+    auth_timeouts.track(sid)
 
 # Disconnection event
 @sio.event
 async def disconnect(sid):
     """Client disconnection event"""
-    if sid in user_sids:
-        user_id = user_sids[sid]
-        # Handle disconnection
-        if user_id in connected_users:
-            del connected_users[user_id]
-        del user_sids[sid]
-        
-        # Notify other users about disconnection
-        logger.info(f"User {user_id} disconnected, notifying other users")
-        await sio.emit('user_disconnected', {'user_id': user_id}, skip_sid=sid)
+    connection = connection_registry.remove(sid)
+    if connection is not None:
+        # Contacts are notified through the presence digest after the user's last device leaves
+        logger.info(f"User {connection.user_id} disconnected ({sid})")
+        presence_manager.user_disconnected(connection.user_id)
     else:
         logger.warning(f"Client {sid} disconnected without authentication")
     
-    # Remove connection time information
-    if sid in connection_times:
-        del connection_times[sid]
+    # Stop tracking the authentication deadline
+    auth_timeouts.discard(sid)
     
     logger.info(f"Client disconnected: {sid}")
 
 # Authentication event
 @sio.event
+@tracked_event
 async def authenticate(sid, data):
     """User authentication event"""
     try:
@@ -119,203 +124,290 @@ async def authenticate(sid, data):
         
         if not user_id:
             logger.warning(f"Authentication failed: Missing user_id from {sid}")
-            await sio.emit('error', {'message': 'User ID is required'}, room=sid)
-            return
+            return await emit_error(sid, 'User ID is required')
         
-        # Check if user exists
-        db = get_session()
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
+        # User ids are always handled as integers
+        user_id = int(user_id)
+        
+        # Per-event session: checked out for the lookups only and returned before any socket I/O
+        async with AsyncSessionLocal() as db:
+            user = await UserService.get_cached_user(db, user_id)
             if not user:
                 logger.warning(f"Authentication failed: User ID {user_id} not found for {sid}")
-                await sio.emit('error', {'message': 'User not found'}, room=sid)
-                return
-            
-            # Remove existing connection if any
-            if user_id in connected_users:
-                old_sid = connected_users[user_id]
-                logger.info(f"Replacing existing connection {old_sid} for user {user_id}")
-                await sio.disconnect(old_sid)
-            
-            # Save connection information
-            connected_users[user_id] = sid
-            user_sids[sid] = user_id
-            
-            # Send authentication success response
-            logger.info(f"User {user_id} authenticated successfully with sid {sid}")
-            await sio.emit('authenticated', {
-                'user_id': user_id,
-                'username': user.username,
-                'status': 'success'
-            }, room=sid)
-            
-            # Send queued messages
-            await send_queued_messages(user_id)
-            
-        finally:
-            db.close()
+                return await emit_error(sid, 'User not found')
+            # Unread badges come from the materialized per-conversation counters
+            unread_counts = await UnreadService.get_unread_counts(db, user_id)
+        
+        # The same sid authenticating as someone else leaves the previous user's room
+        previous_user_id = connection_registry.user_id(sid)
+        if previous_user_id is not None and previous_user_id != user_id:
+            connection_registry.remove(sid)
+            await sio.leave_room(sid, user_room(previous_user_id))
+            presence_manager.user_disconnected(previous_user_id)
+        
+        # Other devices of the same user stay connected; all of them share the user's room
+        auth_timeouts.discard(sid)
+        if connection_registry.add(sid, user_id):
+            await sio.enter_room(sid, user_room(user_id))
+            presence_manager.user_connected(user_id)
+        
+        # Send authentication success response
+        logger.info(f"User {user_id} authenticated successfully with sid {sid}")
+        await sio.emit('authenticated', {
+            'user_id': user_id,
+            'username': user.username,
+            'status': 'success',
+            'unread_counts': unread_counts
+        }, room=sid)
+        
+        # Send messages stored while the user was offline (uses its own short-lived sessions)
+        await send_undelivered_messages(user_id, sid, data.get('last_message_id'))
+        
     except Exception as e:
         logger.error(f"Authentication error for {sid}: {str(e)}", exc_info=True)
-        await sio.emit('error', {'message': f'Authentication failed: {str(e)}'}, room=sid)
+        return await emit_error(sid, f'Authentication failed: {str(e)}')
 
 # Message reception and delivery event
 @sio.event
+@tracked_event
 async def message(sid, data):
     """Message reception and delivery event"""
-    if sid not in user_sids:
-        await sio.emit('error', {'message': 'Not authenticated'}, room=sid)
-        return
+    sender_id = connection_registry.user_id(sid)
+    if sender_id is None:
+        return await emit_error(sid, 'Not authenticated')
     
     try:
-        sender_id = user_sids[sid]
         receiver_id = data.get('receiver_id')
         content = data.get('content')
         
         if not receiver_id or not content:
-            await sio.emit('error', {'message': 'Receiver ID and content are required'}, room=sid)
-            return
+            return await emit_error(sid, 'Receiver ID and content are required')
+        receiver_id = int(receiver_id)
         
-        # Message delivery logic is handled in message_service
-        # Here we only handle direct socket communication
+        # A sent message ends the sender's typing state
+        await clear_typing(sender_id, receiver_id)
         
-        # If receiver is online, send directly
-        if receiver_id in connected_users:
-            receiver_sid = connected_users[receiver_id]
-            await sio.emit('new_message', {
-                'sender_id': sender_id,
-                'receiver_id': receiver_id,
-                'content': content,
-                'timestamp': data.get('timestamp')
-            }, room=receiver_sid)
+        # Persist through the shared batched writer; resolves after the batch commits
+        new_message = await message_writer.submit(sender_id, receiver_id, content)
+        message_payload = DeliveryService.message_payload(new_message)
         
-        # Send confirmation to sender
-        await sio.emit('message_sent', {
-            'receiver_id': receiver_id,
-            'content': content,
-            'timestamp': data.get('timestamp')
-        }, room=sid)
+        # Send to every device of the receiver (offline receivers get it from the database later)
+        await send_personal_message(new_message.receiver_id, message_payload)
+        
+        # Confirm to the sending device, and mirror the message to the sender's other devices
+        await sio.emit('message_sent', message_payload, room=sid)
+        await sio.emit('new_message', message_payload, room=user_room(sender_id), skip_sid=sid)
+        return {'status': 'success', 'data': message_payload}
         
+    except HTTPException as e:
+        return await emit_error(sid, e.detail)
     except Exception as e:
         logger.error(f"Message handling error: {str(e)}")
-        await sio.emit('error', {'message': 'Failed to process message'}, room=sid)
+        return await emit_error(sid, 'Failed to process message')
 
 # Send message to specific user method (for external calls)
-async def send_personal_message(user_id: str, message_data: Dict[str, Any]):
-    """Send message to specific user"""
-    if user_id in connected_users:
-        receiver_sid = connected_users[user_id]
-        await sio.emit('new_message', message_data, room=receiver_sid)
-        return True
-    else:
-        # If user is offline, add message to queue
-        if user_id not in message_queues:
-            message_queues[user_id] = []
-        message_queues[user_id].append(message_data)
-        return False
-
-# Send queued messages method
-async def send_queued_messages(user_id: str):
-    """Send queued messages"""
-    if user_id in message_queues and message_queues[user_id] and user_id in connected_users:
-        sid = connected_users[user_id]
-        for message in message_queues[user_id]:
+async def send_personal_message(user_id: int, message_data: Dict[str, Any]):
+    """Send message to all devices of a specific user"""
+    # The user's room reaches every device of the user, on whichever worker they are connected to
+    # The delivery watermark only moves on replay or when the client acknowledges (ack_delivered)
+    await sio.emit('new_message', message_data, room=user_room(user_id))
+    # Offline users get the message from the database on their next authenticate
+    return connection_registry.is_online(user_id)
+
+def _on_local_emit(event: str, data: Any, room: Optional[str]):
+    """Bus events delivered in this worker: presence of other workers"""
+    if event == 'presence_sync' and room == PRESENCE_ROOM:
+        presence_manager.apply_remote(data)
+
+sio.manager.add_local_emit_hook(_on_local_emit)
+
+# Presence digests go to the watcher's devices on this worker (every worker computes the same digests)
+async def send_presence_update(user_id: int, digest: Dict[str, Any]):
+    await sio.emit('presence_update', digest, room=user_room(user_id), ignore_queue=True)
+
+presence_manager.add_sink(send_presence_update)
+
+# Presence changes of this worker reach the other workers through the message bus (_on_local_emit)
+
+async def publish_presence(update: Dict[str, Any]):
+    await sio.emit('presence_sync', update, room=PRESENCE_ROOM)
+
+presence_manager.set_publisher(publish_presence)
+
+# Send event to specific user method (for external calls, not queued when offline)
+async def send_user_event(user_id: int, event: str, data: Dict[str, Any]) -> bool:
+    """Send an event to all devices of a specific user if online"""
+    await sio.emit(event, data, room=user_room(user_id))
+    return connection_registry.is_online(user_id)
+
+# Send stored (undelivered) messages method
+async def send_undelivered_messages(user_id: int, sid: str, last_message_id: Optional[int] = None):
+    """Stream messages received while offline from the database, in batches"""
+    async def send_batch(messages: List[Dict[str, Any]]):
+        for message in messages:
             await sio.emit('new_message', message, room=sid)
-        message_queues[user_id] = []
-        logger.info(f"Sent queued messages to user {user_id}")
+
+    try:
+        await DeliveryService.stream_undelivered(
+            user_id, send_batch,
+            last_received_id=int(last_message_id) if last_message_id else None
+        )
+    except Exception as e:
+        logger.error(f"Failed to send stored messages to user {user_id}: {str(e)}", exc_info=True)
 
 # User online status check method
-def is_user_online(user_id: str) -> bool:
-    """Check if user is online"""
-    return user_id in connected_users
+def is_user_online(user_id: int) -> bool:
+    """Check if user is online (on any device)"""
+    return connection_registry.is_online(user_id)
 
 # Get active users count method
 def get_active_users_count() -> int:
     """Return current connected users count"""
-    return len(connected_users)
+    return connection_registry.user_count
+
+metrics.gauge("chat_socketio_connected_users", "Users authenticated on this worker's Socket.IO server",
+              function=get_active_users_count)
+metrics.gauge("chat_socketio_connections", "Authenticated Socket.IO connections (devices) on this worker",
+              function=lambda: connection_registry.connection_count)
+metrics.gauge("chat_socketio_unauthenticated_connections", "Connections waiting to authenticate",
+              function=lambda: auth_timeouts.pending)
 
 # Message read status event
 @sio.event
+@tracked_event
 async def mark_read(sid, data):
     """Update message read status"""
     try:
-        if sid not in user_sids:
+        user_id = connection_registry.user_id(sid)
+        if user_id is None:
             logger.warning(f"Unauthorized mark_read attempt from {sid}")
             return {'status': 'error', 'message': 'Not authenticated'}
             
-        user_id = user_sids[sid]
         message_id = data.get('message_id')
         
         if not message_id:
             logger.warning(f"Missing message_id in mark_read from {sid}")
             return {'status': 'error', 'message': 'Missing message_id'}
             
-        # Update message read status
-        db = get_session()
-        try:
-            # Check if message exists and if receiver
-            message = db.query(Message).filter(Message.id == message_id).first()
-            
-            if not message:
-                logger.warning(f"Message {message_id} not found for mark_read")
-                return {'status': 'error', 'message': 'Message not found'}
-                
-            # Only receiver can update read status
-            if message.receiver_id != int(user_id):
-                logger.warning(f"User {user_id} attempted to mark someone else's message as read")
-                return {'status': 'error', 'message': 'Not authorized to mark this message as read'}
-                
-            # If already read, handle
-            if message.is_read:
-                return {'status': 'success', 'message': 'Message already marked as read'}
-                
-            # Update read status
-            message.is_read = True
-            db.commit()
-            
-            logger.info(f"Message {message_id} marked as read by user {user_id}")
-            
-            # Notify sender about read status (if sender is online)
-            sender_id = str(message.sender_id)
-            if sender_id in connected_users:
-                sender_sid = connected_users[sender_id]
-                await sio.emit('message_read', {
-                    'message_id': message_id,
-                    'reader_id': user_id,
-                    'timestamp': datetime.utcnow().isoformat()
-                }, room=sender_sid)
-                logger.info(f"Sent read receipt to sender {sender_id}")
-            
-            return {'status': 'success', 'message': 'Message marked as read'}
-        finally:
-            db.close()
+        # Update message read status (also decrements the unread counter and notifies the sender)
+        async with AsyncSessionLocal() as db:
+            try:
+                await MessageService.update_message_read_status(db, int(message_id), user_id)
+            except HTTPException as e:
+                logger.warning(f"mark_read rejected for message {message_id} by user {user_id}: {e.detail}")
+                return {'status': 'error', 'message': e.detail}
+        
+        logger.info(f"Message {message_id} marked as read by user {user_id}")
+        return {'status': 'success', 'message': 'Message marked as read'}
             
     except Exception as e:
         logger.error(f"Error in mark_read: {str(e)}", exc_info=True)
         return {'status': 'error', 'message': str(e)}
 
+# Delivery acknowledgement event
+@sio.event
+@tracked_event
+async def ack_delivered(sid, data):
+    """Client confirms it has received the user's messages up to message_id"""
+    user_id = connection_registry.user_id(sid)
+    if user_id is None:
+        return {'status': 'error', 'message': 'Not authenticated'}
+    try:
+        message_id = int(data.get('message_id'))
+    except (AttributeError, TypeError, ValueError):
+        return {'status': 'error', 'message': 'Missing message_id'}
+    # Batched; messages after the watermark are sent again on the next authenticate
+    delivery_tracker.mark_delivered(user_id, message_id)
+    return {'status': 'success'}
+
+# Bulk read status event
+@sio.event
+@tracked_event
+async def mark_read_until(sid, data):
+    """Mark all received messages in a conversation as read up to message_id"""
+    try:
+        user_id = connection_registry.user_id(sid)
+        if user_id is None:
+            logger.warning(f"Unauthorized mark_read_until attempt from {sid}")
+            return {'status': 'error', 'message': 'Not authenticated'}
+
+        conversation_id = data.get('conversation_id')
+        message_id = data.get('message_id')
+
+        if not conversation_id or not message_id:
+            logger.warning(f"Missing conversation_id or message_id in mark_read_until from {sid}")
+            return {'status': 'error', 'message': 'Missing conversation_id or message_id'}
+
+        # Single set-based update; the service sends one aggregated receipt to the sender
+        async with AsyncSessionLocal() as db:
+            result = await MessageService.mark_read_until(db, int(conversation_id), user_id, int(message_id))
+
+        logger.info(f"User {user_id} marked {result['updated_count']} messages as read in conversation {conversation_id}")
+        return {'status': 'success', 'data': result}
+
+    except HTTPException as e:
+        return {'status': 'error', 'message': e.detail}
+    except Exception as e:
+        logger.error(f"Error in mark_read_until: {str(e)}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
 # Typing status event
 @sio.event
+@tracked_event
 async def typing(sid, data):
     """Send typing status"""
     try:
-        if sid not in user_sids:
+        user_id = connection_registry.user_id(sid)
+        if user_id is None:
             return {'status': 'error', 'message': 'Not authenticated'}
             
-        user_id = user_sids[sid]
         receiver_id = data.get('receiver_id')
         
         if not receiver_id:
             return {'status': 'error', 'message': 'Missing receiver_id'}
+        receiver_id = int(receiver_id)
             
-        # If receiver is online, send typing status
-        if receiver_id in connected_users:
-            receiver_sid = connected_users[receiver_id]
+        # Forward at most one typing start per throttle window; later keystrokes only extend it
+        if typing_tracker.typing(user_id, receiver_id):
             await sio.emit('typing', {
                 'user_id': user_id
-            }, room=receiver_sid)
+            }, room=user_room(receiver_id))
             
         return {'status': 'success'}
         
     except Exception as e:
         logger.error(f"Error in typing: {str(e)}")
-        return {'status': 'error', 'message': str(e)} 
\ No newline at end of file
+        return {'status': 'error', 'message': str(e)}
+
+# Explicit typing stop event
+@sio.event
+@tracked_event
+async def stop_typing(sid, data):
+    """Stop typing status"""
+    try:
+        user_id = connection_registry.user_id(sid)
+        if user_id is None:
+            return {'status': 'error', 'message': 'Not authenticated'}
+            
+        receiver_id = data.get('receiver_id')
+        
+        if not receiver_id:
+            return {'status': 'error', 'message': 'Missing receiver_id'}
+            
+        await clear_typing(user_id, int(receiver_id))
+        return {'status': 'success'}
+        
+    except Exception as e:
+        logger.error(f"Error in stop_typing: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+# Typing stopped notifications go to the receiver's room
+async def send_typing_stopped(sender_id: int, receiver_id: int):
+    await sio.emit('typing_stopped', {'user_id': sender_id}, room=user_room(receiver_id))
+
+typing_tracker.add_sink(send_typing_stopped)
+
+async def clear_typing(sender_id: int, receiver_id: int):
+    """Clear typing state and notify the receiver if the sender was typing"""
+    if typing_tracker.clear(sender_id, receiver_id):
+        await send_typing_stopped(sender_id, receiver_id) 
\ No newline at end of file
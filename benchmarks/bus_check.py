@@ -0,0 +1,316 @@
+"""
+Socket.IO 메시지 버스 동작 확인 (DB/서버 없이 한 호스트에서 실행)
+
+한 프로세스 안에 클라이언트 매니저를 여러 개 만들고 서로 이벤트가 전달되는지 확인
+- unix:  매니저 간 전달(허브 중계), 느린 리스너 제거, 허브 프로세스가 죽었을 때 다른 매니저가 허브를 이어받음
+- redis: 매니저 간 전달, 서버 재시작 후 재연결
+         --redis-url 이 없으면 최소한의 RESP pub/sub 대역(stand-in) 서버를 프로세스 안에서 띄워 사용
+         (redis 패키지 필요: pip install redis)
+실패하면 AssertionError 와 함께 0이 아닌 코드로 종료
+
+예)
+    python benchmarks/bus_check.py
+    python benchmarks/bus_check.py --bus unix
+    python benchmarks/bus_check.py --bus redis --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socketio  # noqa: E402
+
+from app.service import message_bus  # noqa: E402
+from app.service.message_bus import RedisManager, UnixSocketManager  # noqa: E402
+
+logger = logging.getLogger("bus_check")
+
+# 이벤트가 모든 매니저에 도착하기를 기다리는 최대 시간 (초)
+DELIVERY_TIMEOUT = 5.0
+
+
+class Node:
+    """클라이언트 매니저 하나와 그 매니저에서 로컬로 전달된 이벤트 기록"""
+
+    def __init__(self, name: str, manager: socketio.AsyncManager):
+        self.name = name
+        self.manager = manager
+        self.received: List[Tuple[str, object, Optional[str]]] = []
+        # AsyncServer 에 붙여야 리스너 작업이 시작됨
+        self.server = socketio.AsyncServer(async_mode='asgi', client_manager=manager, logger=logger)
+        manager.add_local_emit_hook(lambda event, data, room: self.received.append((event, data, room)))
+        manager.initialize()
+
+    async def close(self):
+        """리스너 작업 종료 (끝나지 않으면 재접속을 계속 시도하므로)"""
+        thread = getattr(self.manager, "thread", None)
+        if thread is not None:
+            thread.cancel()
+            await asyncio.gather(thread, return_exceptions=True)
+
+    def got(self, token: str) -> bool:
+        return any(isinstance(data, dict) and data.get("token") == token for _, data, _ in self.received)
+
+
+async def wait_for(condition, timeout: float = DELIVERY_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(0.02)
+    return condition()
+
+
+async def assert_delivery(sender: Node, nodes: List[Node], label: str):
+    """sender 가 보낸 이벤트가 모든 노드(자기 자신 포함)에 한 번씩 도착하는지 확인"""
+    token = uuid.uuid4().hex
+    started = time.perf_counter()
+    await sender.manager.emit('bus_check', {"token": token}, namespace='/', room='bus_check')
+    delivered = await wait_for(lambda: all(node.got(token) for node in nodes))
+    missing = [node.name for node in nodes if not node.got(token)]
+    assert delivered, f"{label}: not delivered to {missing}"
+    duplicates = [node.name for node in nodes
+                  if sum(1 for _, data, _ in node.received if isinstance(data, dict) and data.get("token") == token) > 1]
+    assert not duplicates, f"{label}: delivered more than once to {duplicates}"
+    print(f"ok  {label} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+# ---------------------------------------------------------------- unix
+
+def hub_of(nodes: List[Node]) -> Optional[Node]:
+    return next((node for node in nodes if node.manager._hub_server is not None), None)
+
+
+async def check_unix_slow_listener(nodes: List[Node], path: str):
+    """읽지 않는 리스너는 허브가 끊고, 나머지 리스너에는 계속 전달됨"""
+    hub = hub_of(nodes)
+    assert hub is not None, "unix: no manager became the hub"
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(message_bus._ROLE_LISTENER)
+    await writer.drain()
+    assert await wait_for(lambda: len(hub.manager._listeners) == len(nodes) + 1), "unix: stalled listener not registered"
+
+    # 한 번도 읽지 않으므로 허브 쪽 송신 버퍼가 _MAX_LISTENER_BACKLOG 를 넘을 때까지 쌓임
+    payload = "x" * (1024 * 1024)
+    frames = message_bus._MAX_LISTENER_BACKLOG // len(payload) + 8
+    for _ in range(frames):
+        await nodes[0].manager._publish({"method": "noop", "payload": payload, "host_id": "bus_check"})
+    evicted = await wait_for(lambda: len(hub.manager._listeners) == len(nodes))
+    writer.close()
+    assert evicted, "unix: stalled listener was not evicted"
+    print(f"ok  unix slow listener evicted after {frames} x 1 MiB frames")
+    await assert_delivery(nodes[-1], nodes, "unix delivery after eviction")
+
+
+def start_hub_process(path: str) -> subprocess.Popen:
+    """허브 역할만 하는 별도 프로세스 (SIGKILL 로 죽여서 허브 이어받기를 확인)"""
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--hub-only", path],
+                            stdout=subprocess.PIPE, text=True)
+    assert proc.stdout.readline().strip() == "hub ready", "unix: hub process did not start"
+    return proc
+
+
+async def check_unix(nodes_count: int):
+    directory = tempfile.mkdtemp(prefix="bus_check_")
+    path = os.path.join(directory, "bus.sock")
+    hub_proc = start_hub_process(path)
+    nodes: List[Node] = []
+    try:
+        nodes += [Node(f"unix-{i}", UnixSocketManager(path, channel="bus_check")) for i in range(nodes_count)]
+        # 허브는 다른 프로세스가 잡고 있으므로 여기 매니저들은 모두 클라이언트
+        await asyncio.sleep(0.5)
+        assert hub_of(nodes) is None, "unix: a manager became hub while the lock was held"
+        await assert_delivery(nodes[0], nodes, "unix delivery through external hub")
+        await assert_delivery(nodes[-1], nodes, "unix delivery from another manager")
+
+        # 허브 프로세스가 죽으면 재접속하는 매니저 중 하나가 잠금을 얻어 허브가 됨
+        hub_proc.send_signal(signal.SIGKILL)
+        hub_proc.wait()
+        assert await wait_for(lambda: hub_of(nodes) is not None, timeout=10), "unix: no manager took over the hub"
+        # 나머지 리스너가 새 허브에 다시 붙을 때까지 대기 (재시도 간격 1초)
+        new_hub = hub_of(nodes)
+        assert await wait_for(lambda: len(new_hub.manager._listeners) == len(nodes), timeout=10), \
+            "unix: listeners did not reconnect to the new hub"
+        print(f"ok  unix hub failover to {new_hub.name}")
+        await assert_delivery(nodes[0], nodes, "unix delivery after failover")
+
+        await check_unix_slow_listener(nodes, path)
+    finally:
+        for node in nodes:
+            await node.close()
+        if hub_proc.poll() is None:
+            hub_proc.kill()
+            hub_proc.wait()
+
+
+async def run_hub_only(path: str):
+    manager = UnixSocketManager(path, channel="bus_check")
+    await manager._ensure_hub()
+    assert manager._hub_server is not None, "hub lock is held by another process"
+    print("hub ready", flush=True)
+    await asyncio.Event().wait()
+
+
+# ---------------------------------------------------------------- redis
+
+class RedisStandIn:
+    """
+    최소한의 Redis 대역 서버 - RESP2 의 SUBSCRIBE/UNSUBSCRIBE/PUBLISH/PING 만 처리
+    나머지 명령(CLIENT SETINFO, SELECT 등)에는 +OK 로 응답
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: Dict[bytes, set] = {}
+        self._clients: set = set()
+
+    @property
+    def url(self) -> str:
+        # 대역 서버는 RESP3(HELLO)를 지원하지 않음
+        return f"redis://{self.host}:{self.port}/0?protocol=2"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        await self._server.wait_closed()
+        self._subscribers.clear()
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            value = value.encode()
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(RedisStandIn._encode(item) for item in value)
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> List[bytes]:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("client closed")
+        if not line.startswith(b"*"):
+            return line.split()  # inline command
+        args = []
+        for _ in range(int(line[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        channels: set = set()
+        try:
+            while True:
+                command, *args = await self._read_command(reader)
+                name = command.upper()
+                if name == b"SUBSCRIBE":
+                    for channel in args:
+                        channels.add(channel)
+                        self._subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(self._encode([b"subscribe", channel, len(channels)]))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args or list(channels):
+                        channels.discard(channel)
+                        self._subscribers.get(channel, set()).discard(writer)
+                        writer.write(self._encode([b"unsubscribe", channel, len(channels)]))
+                elif name == b"PUBLISH":
+                    channel, data = args
+                    subscribers = list(self._subscribers.get(channel, ()))
+                    for subscriber in subscribers:
+                        subscriber.write(self._encode([b"message", channel, data]))
+                    writer.write(self._encode(len(subscribers)))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for channel in channels:
+                self._subscribers.get(channel, set()).discard(writer)
+            self._clients.discard(writer)
+            writer.close()
+
+
+async def check_redis(nodes_count: int, url: Optional[str]):
+    stand_in = None
+    if url is None:
+        stand_in = RedisStandIn()
+        await stand_in.start()
+        url = stand_in.url
+        print(f"redis stand-in listening on {url}")
+    channel = f"bus_check_{uuid.uuid4().hex[:8]}"
+    nodes = [Node(f"redis-{i}", RedisManager(url, channel=channel)) for i in range(nodes_count)]
+    try:
+        # 모든 매니저가 구독을 마칠 때까지 대기
+        await asyncio.sleep(0.5)
+        await assert_delivery(nodes[0], nodes, "redis delivery")
+        await assert_delivery(nodes[-1], nodes, "redis delivery from another manager")
+
+        if stand_in is not None:
+            # 서버 재시작: 리스너는 재시도 후 다시 구독, 발행은 새 연결로 재시도
+            await stand_in.stop()
+            await asyncio.sleep(0.2)
+            await stand_in.start()
+            for attempt in range(10):
+                try:
+                    await assert_delivery(nodes[0], nodes, "redis delivery after server restart")
+                    break
+                except AssertionError:
+                    if attempt == 9:
+                        raise
+        else:
+            print("skip redis restart check (external server)")
+    finally:
+        for node in nodes:
+            await node.close()
+            if node.manager.redis is not None:
+                await node.manager.redis.aclose()
+        if stand_in is not None:
+            await stand_in.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cross-manager delivery checks for the Socket.IO message buses")
+    parser.add_argument("--bus", choices=["unix", "redis", "all"], default="all", help="Bus to check")
+    parser.add_argument("--managers", type=int, default=3, help="Client managers to start")
+    parser.add_argument("--redis-url", help="Existing Redis-compatible server (default: in-process stand-in)")
+    parser.add_argument("--hub-only", metavar="PATH", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    if args.hub_only:
+        await run_hub_only(args.hub_only)
+        return
+    # 재접속 중 오류 로그가 결과 출력에 섞이지 않도록 함
+    logging.basicConfig(level=logging.CRITICAL)
+    if args.bus in ("unix", "all"):
+        await check_unix(args.managers)
+    if args.bus in ("redis", "all"):
+        await check_redis(args.managers, args.redis_url)
+    print("all bus checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
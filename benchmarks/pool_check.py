@@ -0,0 +1,130 @@
+"""
+유휴 웹소켓 연결이 DB 커넥션 풀을 잡고 있지 않은지 확인
+
+/ws/ws/{user_id} 연결을 N 개(기본: 워커당 풀 크기 DB_POOL_SIZE + DB_MAX_OVERFLOW 보다 10개 많게) 열어 둔 채로
+DB 를 쓰는 HTTP 요청(GET /message/unreadcounts)을 보내고, 모든 요청이 --deadline 초 안에 200 으로 끝나야 통과
+연결마다 풀 연결을 하나씩 잡으면 풀이 가득 차서 HTTP 요청이 DB_POOL_TIMEOUT 까지 기다리다 실패함
+실패하면 0이 아닌 코드로 종료
+
+예)
+    python benchmarks/pool_check.py
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=0 python benchmarks/pool_check.py --ws-clients 100 --deadline 2
+    python benchmarks/pool_check.py --url http://localhost:8000   # 이미 실행 중인 서버 (워커 1개 기준)
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from typing import List, Optional
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_benchmark import (  # noqa: E402
+    create_bench_users, delete_bench_users, percentile, start_server, wait_until_ready
+)
+from app.config.database import DB_POOL_SIZE, DB_MAX_OVERFLOW  # noqa: E402
+
+
+async def hold_websocket(url: str, user_id: int, established: asyncio.Event, stop: asyncio.Event,
+                         open_timeout: float) -> bool:
+    """connection_established 를 받을 때까지 기다린 뒤 stop 까지 연결 유지. 접속 성공 여부 반환"""
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://") + f"/ws/ws/{user_id}"
+    try:
+        async with websockets.connect(ws_url, open_timeout=open_timeout) as websocket:
+            async def wait_established():
+                while json.loads(await websocket.recv()).get("type") != "connection_established":
+                    pass
+            await asyncio.wait_for(wait_established(), open_timeout)
+            established.set()
+            await stop.wait()
+            return True
+    except Exception:
+        return False
+    finally:
+        established.set()
+
+
+async def http_requests(url: str, user_id: int, count: int, deadline: float) -> List[Optional[float]]:
+    """요청별 지연 시간(초). deadline 안에 200 으로 끝나지 않은 요청은 None"""
+    latencies: List[Optional[float]] = []
+    async with httpx.AsyncClient(timeout=deadline) as client:
+        for _ in range(count):
+            started_at = time.perf_counter()
+            try:
+                response = await client.get(f"{url}/message/unreadcounts", params={"user_id": user_id})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started_at if ok else None)
+    return latencies
+
+
+async def run(args) -> bool:
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = create_bench_users(args.ws_clients + 1, run_id)
+    server = None
+    url = args.url
+    try:
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            server = start_server(args.port, 1, {}, args.server_log)
+            await wait_until_ready(url, 60)
+
+        # --connect-concurrency 개씩 접속 (동시에 모두 접속하면 접속 처리 중에 잡는 연결까지 겹쳐서 측정됨)
+        stop = asyncio.Event()
+        holders = []
+        for start in range(1, len(user_ids), args.connect_concurrency):
+            events = []
+            for user_id in user_ids[start:start + args.connect_concurrency]:
+                event = asyncio.Event()
+                events.append(event)
+                holders.append(asyncio.create_task(hold_websocket(url, user_id, event, stop, args.open_timeout)))
+            await asyncio.gather(*(event.wait() for event in events))
+        held = sum(1 for holder in holders if not holder.done())
+
+        latencies = await http_requests(url, user_ids[0], args.requests, args.deadline)
+        stop.set()
+        await asyncio.gather(*holders)
+
+        succeeded = [latency for latency in latencies if latency is not None]
+        print(f"pool per worker: {DB_POOL_SIZE} + {DB_MAX_OVERFLOW} overflow")
+        print(f"websockets held open: {held}/{args.ws_clients}")
+        print(f"http within {args.deadline}s: {len(succeeded)}/{args.requests}"
+              + (f" (p50 {percentile(succeeded, 50) * 1000:.1f} ms, max {max(succeeded) * 1000:.1f} ms)"
+                 if succeeded else ""))
+        passed = held == args.ws_clients and len(succeeded) == args.requests
+        print("PASS" if passed else "FAIL")
+        return passed
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        delete_bench_users(run_id)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Idle websocket clients must not starve database-backed HTTP requests")
+    parser.add_argument("--ws-clients", type=int, default=DB_POOL_SIZE + DB_MAX_OVERFLOW + 10,
+                        help="Websocket clients held open (default: pool size + overflow + 10)")
+    parser.add_argument("--requests", type=int, default=5, help="HTTP requests sent while the websockets are open")
+    parser.add_argument("--deadline", type=float, default=3.0, help="Seconds each HTTP request may take")
+    parser.add_argument("--connect-concurrency", type=int, default=10, help="Websockets connecting at the same time")
+    parser.add_argument("--open-timeout", type=float, default=5.0, help="Seconds to wait for each websocket")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8770, help="Port for the server started by the check")
+    parser.add_argument("--server-log", help="Write the started server's output to this file")
+    return parser.parse_args()
+
+
+def main():
+    sys.exit(0 if asyncio.run(run(parse_args())) else 1)
+
+
+if __name__ == "__main__":
+    main()
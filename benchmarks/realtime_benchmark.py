@@ -0,0 +1,559 @@
+"""
+실시간 경로 부하/지연 시간 벤치마크
+
+벤치마크 전용 사용자를 DB에 만들고, Socket.IO 클라이언트와 /ws/ws/{user_id} 웹소켓 클라이언트를
+동시에 접속시킨 뒤 authenticate / message / mark_read / typing 을 지정한 속도로 보냄
+결과: 처리량, 전송 확인(ack)/전달(end-to-end) 지연 시간 p50/p95/p99, 서버 RSS
+
+예)
+    # 서버를 직접 띄워서 측정 (기본: uvicorn 1 worker, 로컬 PostgreSQL)
+    python benchmarks/realtime_benchmark.py --users 1000 --ws-clients 500 --message-rate 500 --duration 30
+
+    # 이미 실행 중인 서버 측정 (같은 DB를 바라보고 있어야 함)
+    python benchmarks/realtime_benchmark.py --url http://localhost:8000 --server-pid 12345
+
+    # 결과를 JSON으로 저장해 이전 결과와 비교
+    python benchmarks/realtime_benchmark.py --json results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import bcrypt
+import httpx
+import socketio
+import websockets
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.database import engine  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+logger = logging.getLogger("benchmark")
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# 벤치마크 사용자 이메일 도메인 (정리할 때 이 도메인만 삭제)
+BENCH_EMAIL_DOMAIN = "bench.invalid"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    """초 단위 값을 밀리초 p50/p95/p99 로 요약"""
+    summary = {"count": len(values)}
+    for pct in (50, 95, 99):
+        value = percentile(values, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# 벤치마크 사용자 준비/정리 (비밀번호 해싱을 피하려고 DB에 직접 생성)
+# ---------------------------------------------------------------------------
+
+def create_bench_users(count: int, run_id: str) -> List[int]:
+    password = bcrypt.hashpw(b"benchmark", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    rows = [
+        {
+            "username": f"bench_{run_id}_{i}",
+            "email": f"bench_{run_id}_{i}@{BENCH_EMAIL_DOMAIN}",
+            "password": password
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (username, email, password) VALUES (:username, :email, :password)"),
+            rows
+        )
+        user_ids = [row[0] for row in conn.execute(
+            text("SELECT id FROM users WHERE email LIKE :pattern ORDER BY id"),
+            {"pattern": f"bench\\_{run_id}\\_%@{BENCH_EMAIL_DOMAIN}"}
+        )]
+    return user_ids
+
+
+def delete_bench_users(run_id: Optional[str] = None):
+    """벤치마크 사용자와 관련 데이터 삭제 (run_id 가 없으면 모든 벤치마크 사용자)"""
+    pattern = f"bench\\_{run_id}\\_%@{BENCH_EMAIL_DOMAIN}" if run_id else f"%@{BENCH_EMAIL_DOMAIN}"
+    users = "SELECT id FROM users WHERE email LIKE :pattern"
+    conversations = f"SELECT id FROM conversations WHERE user_low_id IN ({users}) OR user_high_id IN ({users})"
+    statements = [
+        f"DELETE FROM conversation_summaries WHERE conversation_id IN ({conversations})",
+        f"DELETE FROM unread_counters WHERE conversation_id IN ({conversations})",
+        f"DELETE FROM messages WHERE sender_id IN ({users}) OR receiver_id IN ({users})",
+        f"DELETE FROM conversations WHERE id IN ({conversations})",
+        f"DELETE FROM delivery_states WHERE user_id IN ({users})",
+        f"DELETE FROM contacts WHERE user_id IN ({users}) OR contact_id IN ({users})",
+        f"DELETE FROM users WHERE id IN ({users})",
+    ]
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement), {"pattern": pattern})
+
+
+# ---------------------------------------------------------------------------
+# 서버 프로세스
+# ---------------------------------------------------------------------------
+
+def start_server(port: int, workers: int, env: Dict[str, str], log_path: Optional[str]) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    # 애플리케이션 로그가 결과 출력에 섞이지 않도록 파일로 보냄
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """pid 와 모든 자식 프로세스의 RSS 합계 (바이트, /proc 기반)"""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[int(entry)] = int(line.split()[1]) * 1024
+                        break
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    if pid not in rss:
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total
+
+
+async def wait_until_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(f"{url}/ready")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+
+# ---------------------------------------------------------------------------
+# 부하 생성
+# ---------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.connect_latency: List[float] = []
+        self.ws_connect_latency: List[float] = []
+        self.auth_latency: List[float] = []
+        self.ack_latency: List[float] = []
+        self.delivery_latency: List[float] = []
+        self.mark_read_latency: List[float] = []
+        self.typing_latency: List[float] = []
+        self.http_latency: List[float] = []
+        self.sent = 0
+        self.acked = 0
+        self.delivered = 0
+        self.errors: Dict[str, int] = {}
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+class SocketIOUser:
+    def __init__(self, user_id: int, url: str, stats: Stats, sent_at: Dict[str, float], read_ratio: float):
+        self.user_id = user_id
+        self.url = url
+        self.stats = stats
+        self.sent_at = sent_at
+        self.read_ratio = read_ratio
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.authenticated = asyncio.Event()
+        self.client.on("authenticated", self._on_authenticated)
+        self.client.on("new_message", self._on_new_message)
+
+    async def _on_authenticated(self, data):
+        self.authenticated.set()
+
+    async def _on_new_message(self, data):
+        started_at = self.sent_at.pop(data.get("content", ""), None)
+        if started_at is None:
+            # 이전 실행에서 남은 오프라인 메시지 등
+            return
+        self.stats.delivered += 1
+        self.stats.delivery_latency.append(time.perf_counter() - started_at)
+        if self.read_ratio and random.random() < self.read_ratio:
+            asyncio.create_task(self.mark_read(data["message_id"]))
+
+    async def connect(self):
+        started_at = time.perf_counter()
+        await self.client.connect(self.url, transports=["websocket"])
+        self.stats.connect_latency.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await self.client.emit("authenticate", {"user_id": self.user_id})
+        await asyncio.wait_for(self.authenticated.wait(), timeout=30)
+        self.stats.auth_latency.append(time.perf_counter() - started_at)
+
+    async def send_message(self, receiver_id: int):
+        content = f"bench {uuid.uuid4().hex}"
+        started_at = time.perf_counter()
+        self.sent_at[content] = started_at
+        self.stats.sent += 1
+        try:
+            response = await self.client.call("message", {"receiver_id": receiver_id, "content": content},
+                                              timeout=30)
+        except Exception:
+            self.sent_at.pop(content, None)
+            self.stats.error("message_timeout")
+            return
+        if isinstance(response, dict) and response.get("status") == "success":
+            self.stats.acked += 1
+            self.stats.ack_latency.append(time.perf_counter() - started_at)
+        else:
+            self.sent_at.pop(content, None)
+            self.stats.error(f"message_error:{response.get('message') if isinstance(response, dict) else response}")
+
+    async def mark_read(self, message_id: int):
+        started_at = time.perf_counter()
+        try:
+            response = await self.client.call("mark_read", {"message_id": message_id}, timeout=30)
+        except Exception:
+            self.stats.error("mark_read_timeout")
+            return
+        if isinstance(response, dict) and response.get("status") == "success":
+            self.stats.mark_read_latency.append(time.perf_counter() - started_at)
+        else:
+            self.stats.error(f"mark_read_error:{response.get('message') if isinstance(response, dict) else response}")
+
+    async def typing(self, receiver_id: int):
+        started_at = time.perf_counter()
+        try:
+            await self.client.call("typing", {"receiver_id": receiver_id}, timeout=30)
+            self.stats.typing_latency.append(time.perf_counter() - started_at)
+        except Exception:
+            self.stats.error("typing_timeout")
+
+    async def close(self):
+        try:
+            await self.client.disconnect()
+        except Exception:
+            pass
+
+
+async def hold_websocket(url: str, user_id: int, stats: Stats, ready: asyncio.Event, stop: asyncio.Event):
+    """/ws/ws/{user_id} 연결을 유지하며 수신 메시지를 버림 (접속이 끝나면 ready 설정)"""
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://") + f"/ws/ws/{user_id}"
+    started_at = time.perf_counter()
+    try:
+        async with websockets.connect(ws_url, open_timeout=30) as websocket:
+            while True:
+                message = json.loads(await websocket.recv())
+                if message.get("type") == "connection_established":
+                    stats.ws_connect_latency.append(time.perf_counter() - started_at)
+                    break
+            ready.set()
+            stop_task = asyncio.create_task(stop.wait())
+            while not stop_task.done():
+                recv_task = asyncio.create_task(websocket.recv())
+                await asyncio.wait({recv_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not recv_task.done():
+                    recv_task.cancel()
+    except Exception:
+        stats.error("ws_connect")
+    finally:
+        ready.set()
+
+
+async def drive(rate: float, duration: float, action):
+    """초당 rate 번 action() 을 실행 (10ms 단위로 밀린 만큼 한꺼번에 실행)"""
+    if rate <= 0:
+        return []
+    tasks = []
+    started_at = time.monotonic()
+    issued = 0
+    while True:
+        elapsed = time.monotonic() - started_at
+        if elapsed >= duration:
+            break
+        due = int(elapsed * rate) - issued
+        for _ in range(due):
+            tasks.append(asyncio.create_task(action()))
+        issued += max(due, 0)
+        await asyncio.sleep(0.01)
+    return tasks
+
+
+async def gather_in_batches(coroutines, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(c) for c in coroutines), return_exceptions=True)
+
+
+async def run_benchmark(args, url: str, user_ids: List[int], server_pid: Optional[int]) -> Dict:
+    stats = Stats()
+    sent_at: Dict[str, float] = {}
+    socket_user_ids = user_ids[:args.users]
+    ws_user_ids = user_ids[args.users:]
+
+    # Socket.IO 접속 + 인증
+    logger.info(f"Connecting {len(socket_user_ids)} Socket.IO clients...")
+    clients = [SocketIOUser(user_id, url, stats, sent_at, args.read_ratio) for user_id in socket_user_ids]
+    results = await gather_in_batches([client.connect() for client in clients], args.connect_concurrency)
+    connected = [client for client, result in zip(clients, results) if not isinstance(result, Exception)]
+    for result in results:
+        if isinstance(result, Exception):
+            stats.error(f"connect:{type(result).__name__}")
+
+    # 웹소켓 클라이언트 접속 (연결 유지만 함)
+    stop_websockets = asyncio.Event()
+    ws_tasks = []
+    if ws_user_ids:
+        logger.info(f"Connecting {len(ws_user_ids)} websocket clients...")
+        semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+        async def open_websocket(user_id):
+            async with semaphore:
+                ready = asyncio.Event()
+                ws_tasks.append(asyncio.create_task(hold_websocket(url, user_id, stats, ready, stop_websockets)))
+                await ready.wait()
+
+        await asyncio.gather(*(open_websocket(user_id) for user_id in ws_user_ids))
+
+    rss_idle = process_tree_rss(server_pid) if server_pid else None
+    if len(connected) < 2:
+        raise RuntimeError("Fewer than two Socket.IO clients connected; nothing to measure")
+
+    # 부하 구간
+    logger.info(f"Driving load for {args.duration}s "
+                f"(message {args.message_rate}/s, typing {args.typing_rate}/s, http {args.http_rate}/s, "
+                f"read ratio {args.read_ratio})")
+
+    def random_pair():
+        sender = random.choice(connected)
+        receiver = random.choice(connected)
+        while receiver is sender:
+            receiver = random.choice(connected)
+        return sender, receiver
+
+    async def send_one():
+        sender, receiver = random_pair()
+        await sender.send_message(receiver.user_id)
+
+    async def type_one():
+        sender, receiver = random_pair()
+        await sender.typing(receiver.user_id)
+
+    # 실시간 클라이언트가 많아도 DB를 쓰는 HTTP 요청이 굶지 않는지 확인
+    http_client = httpx.AsyncClient(timeout=30)
+
+    async def http_one():
+        started_at = time.perf_counter()
+        try:
+            response = await http_client.get(f"{url}/message/unreadcounts",
+                                             params={"user_id": random.choice(user_ids)})
+        except httpx.HTTPError:
+            stats.error("http_timeout")
+            return
+        if response.status_code == 200:
+            stats.http_latency.append(time.perf_counter() - started_at)
+        else:
+            stats.error(f"http_{response.status_code}")
+
+    load_started_at = time.perf_counter()
+    drivers = await asyncio.gather(
+        drive(args.message_rate, args.duration, send_one),
+        drive(args.typing_rate, args.duration, type_one),
+        drive(args.http_rate, args.duration, http_one),
+    )
+    pending = [task for tasks in drivers for task in tasks]
+    if pending:
+        await asyncio.wait(pending, timeout=args.drain_timeout)
+    # 전달 대기
+    deadline = time.monotonic() + args.drain_timeout
+    while sent_at and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    load_elapsed = time.perf_counter() - load_started_at
+    rss_loaded = process_tree_rss(server_pid) if server_pid else None
+
+    # 정리
+    await http_client.aclose()
+    stop_websockets.set()
+    await asyncio.gather(*(client.close() for client in connected), return_exceptions=True)
+    if ws_tasks:
+        await asyncio.wait(ws_tasks, timeout=10)
+
+    return {
+        "config": {
+            "socketio_clients": len(socket_user_ids),
+            "websocket_clients": len(ws_user_ids),
+            "duration_s": args.duration,
+            "message_rate": args.message_rate,
+            "typing_rate": args.typing_rate,
+            "http_rate": args.http_rate,
+            "read_ratio": args.read_ratio,
+            "workers": args.workers if not args.url else None,
+        },
+        "connections": {
+            "socketio_connected": len(connected),
+            "websocket_connected": len(stats.ws_connect_latency),
+            "socketio_connect": latency_summary(stats.connect_latency),
+            "socketio_authenticate": latency_summary(stats.auth_latency),
+            "websocket_connect": latency_summary(stats.ws_connect_latency),
+        },
+        "messages": {
+            "sent": stats.sent,
+            "acked": stats.acked,
+            "delivered": stats.delivered,
+            "lost": len(sent_at),
+            "throughput_per_s": round(stats.delivered / load_elapsed, 1) if load_elapsed else None,
+            "ack": latency_summary(stats.ack_latency),
+            "delivery": latency_summary(stats.delivery_latency),
+        },
+        "mark_read": latency_summary(stats.mark_read_latency),
+        "typing": latency_summary(stats.typing_latency),
+        "http": latency_summary(stats.http_latency),
+        "errors": stats.errors,
+        "server_rss_mb": {
+            "after_connect": round(rss_idle / 2**20, 1) if rss_idle else None,
+            "after_load": round(rss_loaded / 2**20, 1) if rss_loaded else None,
+        },
+    }
+
+
+def print_report(report: Dict):
+    config = report["config"]
+    connections = report["connections"]
+    messages = report["messages"]
+
+    def fmt(summary):
+        return (f"n={summary['count']:<7} p50={summary['p50_ms']}ms  "
+                f"p95={summary['p95_ms']}ms  p99={summary['p99_ms']}ms")
+
+    print()
+    print(f"Clients: {connections['socketio_connected']}/{config['socketio_clients']} Socket.IO, "
+          f"{connections['websocket_connected']}/{config['websocket_clients']} websocket")
+    print(f"  socket.io connect    {fmt(connections['socketio_connect'])}")
+    print(f"  authenticate         {fmt(connections['socketio_authenticate'])}")
+    print(f"  websocket connect    {fmt(connections['websocket_connect'])}")
+    print(f"Messages: sent={messages['sent']} acked={messages['acked']} delivered={messages['delivered']} "
+          f"lost={messages['lost']} throughput={messages['throughput_per_s']}/s")
+    print(f"  ack (stored)         {fmt(messages['ack'])}")
+    print(f"  delivery (e2e)       {fmt(messages['delivery'])}")
+    print(f"  mark_read            {fmt(report['mark_read'])}")
+    print(f"  typing               {fmt(report['typing'])}")
+    print(f"  http (db query)      {fmt(report['http'])}")
+    print(f"Server RSS: {report['server_rss_mb']['after_connect']} MB after connect, "
+          f"{report['server_rss_mb']['after_load']} MB after load")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the realtime chat path")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID of the running server (for RSS with --url)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the spawned server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    parser.add_argument("--message-bus", default=None,
+                        help="SOCKETIO_MESSAGE_BUS for the spawned server (defaults to unix with --workers > 1)")
+    parser.add_argument("--users", type=int, default=200, help="Socket.IO clients")
+    parser.add_argument("--ws-clients", type=int, default=0, help="Raw /ws/ws/{user_id} clients")
+    parser.add_argument("--duration", type=float, default=20, help="Load phase length in seconds")
+    parser.add_argument("--message-rate", type=float, default=200, help="Messages per second (all clients)")
+    parser.add_argument("--typing-rate", type=float, default=200, help="Typing events per second (all clients)")
+    parser.add_argument("--http-rate", type=float, default=20,
+                        help="GET /message/unreadcounts requests per second during the load phase")
+    parser.add_argument("--read-ratio", type=float, default=0.5,
+                        help="Fraction of received messages marked read with mark_read")
+    parser.add_argument("--connect-concurrency", type=int, default=100, help="Parallel connection attempts")
+    parser.add_argument("--drain-timeout", type=float, default=15,
+                        help="Seconds to wait for outstanding acks/deliveries after the load phase")
+    parser.add_argument("--server-log", help="Write the spawned server's output to this file")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--keep-users", action="store_true", help="Do not delete benchmark users afterwards")
+    parser.add_argument("--cleanup", action="store_true", help="Delete all benchmark users and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.cleanup:
+        delete_bench_users()
+        logger.info("Deleted all benchmark users")
+        return
+
+    # 클라이언트 수만큼 파일 디스크립터 필요
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = create_bench_users(args.users + args.ws_clients, run_id)
+    logger.info(f"Created {len(user_ids)} benchmark users (run {run_id})")
+
+    server = None
+    try:
+        if args.url:
+            url, server_pid = args.url.rstrip("/"), args.server_pid
+        else:
+            env = {}
+            bus = args.message_bus or ("unix" if args.workers > 1 else None)
+            if bus:
+                env["SOCKETIO_MESSAGE_BUS"] = bus
+            server = start_server(args.port, args.workers, env, args.server_log)
+            url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+        asyncio.run(wait_until_ready(url, timeout=60))
+        report = asyncio.run(run_benchmark(args, url, user_ids, server_pid))
+        print_report(report)
+        if args.json:
+            os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Report written to {args.json}")
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if not args.keep_users:
+            delete_bench_users(run_id)
+            logger.info("Deleted benchmark users")
+
+
+if __name__ == "__main__":
+    main()
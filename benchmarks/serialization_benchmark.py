@@ -0,0 +1,154 @@
+"""
+메시지 직렬화 비용 벤치마크 (DB/서버 없이 프로세스 안에서 측정)
+
+기록 조회 응답과 Socket.IO new_message 패킷을 만드는 데 드는 메시지당 시간을 경로별로 비교
+- legacy:  ORM 객체 -> 손으로 만든 dict -> jsonable_encoder -> 표준 json (이전 라우터 방식)
+- dict:    serialize_message -> FastJSONResponse (jsonable_encoder 생략)
+- rows:    MESSAGE_COLUMNS 행 -> encode_message_page 로 바로 바이트 인코딩 (현재 기록 조회 방식)
+orjson 이 설치되어 있으면 표준 json 대체 경로(fallback)도 함께 측정
+
+예)
+    python benchmarks/serialization_benchmark.py
+    python benchmarks/serialization_benchmark.py --page-sizes 50 200 5000 --repeat 20 --json results/serialization.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from socketio import packet  # noqa: E402
+
+# Message 매퍼 설정에 관계된 모델을 모두 등록
+from app.models.user import User  # noqa: E402,F401
+from app.models.contact import Contact  # noqa: E402,F401
+from app.models.conversation import Conversation  # noqa: E402,F401
+from app.models.message import Message  # noqa: E402
+from app.service import message_serializer  # noqa: E402
+from app.service.message_serializer import (  # noqa: E402
+    FastJSONResponse, SocketIOJSON, serialize_message, encode_message_page
+)
+
+MessageRow = namedtuple(
+    "MessageRow", ["id", "conversation_id", "content", "sender_id", "receiver_id", "created_at", "is_read"]
+)
+
+
+def make_messages(count: int):
+    """같은 내용의 ORM 객체와 컬럼 행을 생성"""
+    start = datetime(2024, 3, 11, 12, 0, 0)
+    rows = [
+        MessageRow(1000 + i, 12, f"안녕하세요 message {i} with some typical chat length text", 123, 456,
+                   start + timedelta(seconds=i, microseconds=i), i % 3 == 0)
+        for i in range(count)
+    ]
+    objects = [Message(**row._asdict()) for row in rows]
+    return objects, rows
+
+
+def legacy_page(objects) -> bytes:
+    message_list = []
+    for msg in objects:
+        message_list.append({
+            "id": msg.id,
+            "conversation_id": msg.conversation_id,
+            "content": msg.content,
+            "sender_id": msg.sender_id,
+            "receiver_id": msg.receiver_id,
+            "created_at": msg.created_at.isoformat(),
+            "is_read": msg.is_read
+        })
+    return JSONResponse(jsonable_encoder({"messages": message_list, "next_cursor": 999})).body
+
+
+def dict_page(objects) -> bytes:
+    return FastJSONResponse({"messages": [serialize_message(msg) for msg in objects], "next_cursor": 999}).body
+
+
+def rows_page(rows) -> bytes:
+    return encode_message_page(rows, 999)
+
+
+def socketio_packets(objects, json_module) -> List[str]:
+    encoded = []
+    for msg in objects:
+        payload = serialize_message(msg, id_key="message_id", time_key="timestamp")
+        pkt = packet.Packet(packet.EVENT, data=["new_message", payload], namespace="/")
+        pkt.json = json_module
+        encoded.append(pkt.encode())
+    return encoded
+
+
+def measure(fn: Callable[[], object], count: int, repeat: int) -> float:
+    """repeat 번 중 가장 빠른 실행의 메시지당 마이크로초"""
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best / count * 1e6, 3)
+
+
+def run(page_sizes: List[int], repeat: int) -> Dict[str, Dict[str, float]]:
+    has_orjson = message_serializer.orjson is not None
+    report: Dict[str, Dict[str, float]] = {}
+    for size in page_sizes:
+        objects, rows = make_messages(size)
+        # 세 경로가 같은 JSON 을 만드는지 확인
+        assert json.loads(legacy_page(objects)) == json.loads(dict_page(objects)) == json.loads(rows_page(rows))
+
+        results = {
+            "legacy": measure(lambda: legacy_page(objects), size, repeat),
+            "dict": measure(lambda: dict_page(objects), size, repeat),
+            "rows": measure(lambda: rows_page(rows), size, repeat),
+            "socketio_stdlib": measure(lambda: socketio_packets(objects, json), size, repeat),
+            "socketio_app": measure(lambda: socketio_packets(objects, SocketIOJSON), size, repeat),
+        }
+        if has_orjson:
+            saved = message_serializer.orjson
+            message_serializer.orjson = None
+            try:
+                results["rows_fallback"] = measure(lambda: rows_page(rows), size, repeat)
+            finally:
+                message_serializer.orjson = saved
+        report[str(size)] = results
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    print(f"orjson: {'yes' if message_serializer.orjson is not None else 'no (stdlib json)'}")
+    print("microseconds per message (best of repeats)")
+    columns = list(next(iter(report.values())).keys())
+    print(f"{'page':>8} " + " ".join(f"{name:>16}" for name in columns))
+    for size, results in report.items():
+        print(f"{size:>8} " + " ".join(f"{results[name]:>16}" for name in columns))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-message serialization cost for history and Socket.IO payloads")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[50, 200, 5000], help="Messages per response")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case (best is reported)")
+    parser.add_argument("--json", help="Write the report to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = run(args.page_sizes, args.repeat)
+    print_report(report)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
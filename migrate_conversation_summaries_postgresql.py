@@ -0,0 +1,61 @@
+from app.config.database import SessionLocal, engine
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.models.conversation_summary import ConversationSummary
+from app.service.conversation_service import SUMMARY_PREVIEW_LENGTH
+from sqlalchemy import text
+import logging
+
+logger = logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_conversation_summaries_postgresql():
+    """
+    PostgreSQL에서 conversation_summaries 테이블 생성 후 대화별 마지막 메시지로 채움
+    migrate_conversations_postgresql.py 로 conversation_id 를 채운 뒤 실행
+    """
+    # conversation_summaries 테이블/인덱스 생성 (이미 있으면 건너뜀)
+    ConversationSummary.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        logger.info("Building conversation summaries from existing messages...")
+        result = db.execute(text("""
+        WITH last_messages AS (
+            SELECT DISTINCT ON (conversation_id)
+                   conversation_id, id, sender_id, receiver_id, content, created_at
+            FROM messages
+            WHERE conversation_id IS NOT NULL
+            ORDER BY conversation_id, id DESC
+        ), participants AS (
+            SELECT conversation_id, sender_id AS user_id, receiver_id AS other_user_id, id, sender_id, content, created_at
+            FROM last_messages
+            UNION
+            SELECT conversation_id, receiver_id, sender_id, id, sender_id, content, created_at
+            FROM last_messages
+        )
+        INSERT INTO conversation_summaries
+            (user_id, conversation_id, other_user_id, last_message_id, last_sender_id,
+             last_message_preview, last_message_at)
+        SELECT user_id, conversation_id, other_user_id, id, sender_id, LEFT(content, :preview_length), created_at
+        FROM participants
+        ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+            last_message_id = EXCLUDED.last_message_id,
+            last_sender_id = EXCLUDED.last_sender_id,
+            last_message_preview = EXCLUDED.last_message_preview,
+            last_message_at = EXCLUDED.last_message_at
+        WHERE conversation_summaries.last_message_id < EXCLUDED.last_message_id;
+        """), {"preview_length": SUMMARY_PREVIEW_LENGTH})
+        db.commit()
+        logger.info(f"Initialized {result.rowcount} conversation summaries")
+    except Exception as e:
+        logger.error(f"Migration error: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logger.info("Starting PostgreSQL conversation summary migration...")
+    migrate_conversation_summaries_postgresql()
+    logger.info("PostgreSQL conversation summary migration completed")
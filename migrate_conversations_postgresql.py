@@ -0,0 +1,85 @@
+from app.config.database import SessionLocal, engine
+from app.models.user import User
+from app.models.conversation import Conversation
+from sqlalchemy import text
+import logging
+import os
+
+logger = logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 한 번에 갱신할 메시지 ID 범위 크기
+BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))
+
+def migrate_conversations_postgresql():
+    """
+    PostgreSQL에서 conversations 테이블 생성, messages.conversation_id 컬럼/인덱스 추가 후
+    기존 메시지의 conversation_id를 배치 단위로 채움
+    """
+    # conversations 테이블 생성 (이미 있으면 건너뜀)
+    Conversation.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        # conversation_id 컬럼이 없으면 추가
+        logger.info("Adding conversation_id column to messages table...")
+        db.execute(text("""
+        ALTER TABLE messages
+        ADD COLUMN IF NOT EXISTS conversation_id INTEGER REFERENCES conversations(id);
+        """))
+        db.commit()
+
+        # 기존 메시지의 사용자 쌍으로 대화 생성
+        logger.info("Creating conversations for existing user pairs...")
+        db.execute(text("""
+        INSERT INTO conversations (user_low_id, user_high_id, created_at)
+        SELECT LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id), MIN(created_at)
+        FROM messages
+        GROUP BY LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id)
+        ON CONFLICT (user_low_id, user_high_id) DO NOTHING;
+        """))
+        db.commit()
+
+        # ID 범위 단위로 conversation_id 채우기 (배치마다 commit 하여 잠금 시간 최소화)
+        bounds = db.execute(text("SELECT MIN(id), MAX(id) FROM messages WHERE conversation_id IS NULL")).fetchone()
+        if bounds[0] is not None:
+            start_id, max_id = bounds[0] - 1, bounds[1]
+            total = 0
+            while start_id < max_id:
+                end_id = start_id + BATCH_SIZE
+                result = db.execute(text("""
+                UPDATE messages m
+                SET conversation_id = c.id
+                FROM conversations c
+                WHERE m.id > :start_id AND m.id <= :end_id
+                AND m.conversation_id IS NULL
+                AND c.user_low_id = LEAST(m.sender_id, m.receiver_id)
+                AND c.user_high_id = GREATEST(m.sender_id, m.receiver_id);
+                """), {"start_id": start_id, "end_id": end_id})
+                db.commit()
+                total += result.rowcount
+                logger.info(f"Backfilled messages {start_id + 1}..{end_id} ({total} rows so far)")
+                start_id = end_id
+        else:
+            logger.info("No messages to backfill")
+
+    except Exception as e:
+        logger.error(f"Migration error: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # 대용량 테이블 잠금을 피하기 위해 CONCURRENTLY로 인덱스 생성 (트랜잭션 밖에서 실행)
+    logger.info("Creating (conversation_id, created_at, id) index on messages...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_created_id
+        ON messages (conversation_id, created_at, id);
+        """))
+    logger.info("Index created successfully")
+
+if __name__ == "__main__":
+    logger.info("Starting PostgreSQL conversation migration...")
+    migrate_conversations_postgresql()
+    logger.info("PostgreSQL conversation migration completed")
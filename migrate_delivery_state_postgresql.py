@@ -0,0 +1,49 @@
+from app.config.database import SessionLocal, engine
+from app.models.user import User
+from app.models.delivery_state import DeliveryState
+from sqlalchemy import text
+import logging
+
+logger = logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_delivery_state_postgresql():
+    """
+    PostgreSQL에서 delivery_states 테이블 생성 및 messages (receiver_id, id) 인덱스 추가
+    기존 메시지는 이미 전달된 것으로 보고 사용자별 워터마크를 현재 마지막 수신 메시지로 설정
+    """
+    # delivery_states 테이블 생성 (이미 있으면 건너뜀)
+    DeliveryState.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        logger.info("Initializing delivery watermarks for existing users...")
+        result = db.execute(text("""
+        INSERT INTO delivery_states (user_id, last_delivered_message_id, updated_at)
+        SELECT receiver_id, MAX(id), NOW()
+        FROM messages
+        GROUP BY receiver_id
+        ON CONFLICT (user_id) DO NOTHING;
+        """))
+        db.commit()
+        logger.info(f"Initialized {result.rowcount} delivery watermarks")
+    except Exception as e:
+        logger.error(f"Migration error: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # 대용량 테이블 잠금을 피하기 위해 CONCURRENTLY로 인덱스 생성 (트랜잭션 밖에서 실행)
+    logger.info("Creating (receiver_id, id) index on messages...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_receiver_id_id
+        ON messages (receiver_id, id);
+        """))
+    logger.info("Index created successfully")
+
+if __name__ == "__main__":
+    logger.info("Starting PostgreSQL delivery state migration...")
+    migrate_delivery_state_postgresql()
+    logger.info("PostgreSQL delivery state migration completed")
@@ -0,0 +1,43 @@
+from app.config.database import SessionLocal, engine
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.models.unread_counter import UnreadCounter
+from sqlalchemy import text
+import logging
+
+logger = logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_unread_counters_postgresql():
+    """
+    PostgreSQL에서 unread_counters 테이블 생성 후 기존 메시지로 읽지 않은 메시지 수 계산
+    migrate_conversations_postgresql.py 로 conversation_id 를 채운 뒤 실행
+    """
+    # unread_counters 테이블 생성 (이미 있으면 건너뜀)
+    UnreadCounter.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        logger.info("Computing unread counters from existing messages...")
+        result = db.execute(text("""
+        INSERT INTO unread_counters (user_id, conversation_id, unread_count, updated_at)
+        SELECT receiver_id, conversation_id, COUNT(*), NOW()
+        FROM messages
+        WHERE is_read = FALSE AND conversation_id IS NOT NULL
+        GROUP BY receiver_id, conversation_id
+        ON CONFLICT (user_id, conversation_id)
+        DO UPDATE SET unread_count = EXCLUDED.unread_count, updated_at = EXCLUDED.updated_at;
+        """))
+        db.commit()
+        logger.info(f"Initialized {result.rowcount} unread counters")
+    except Exception as e:
+        logger.error(f"Migration error: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logger.info("Starting PostgreSQL unread counter migration...")
+    migrate_unread_counters_postgresql()
+    logger.info("PostgreSQL unread counter migration completed")
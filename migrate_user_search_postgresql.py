@@ -0,0 +1,51 @@
+from app.config.database import engine
+from sqlalchemy import text
+import logging
+
+logger = logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (인덱스 이름, 생성 SQL)
+# 접두사 검색용 (lower(email) LIKE 'term%')
+PREFIX_INDEXES = [
+    ("ix_users_email_lower_prefix",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_lower_prefix ON users (lower(email) text_pattern_ops);"),
+    ("ix_users_username_lower_prefix",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_lower_prefix ON users (lower(username) text_pattern_ops);"),
+]
+
+# 부분 일치 검색용 (lower(email) LIKE '%term%')
+TRIGRAM_INDEXES = [
+    ("ix_users_email_trgm",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm ON users USING gin (lower(email) gin_trgm_ops);"),
+    ("ix_users_username_trgm",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops);"),
+]
+
+def migrate_user_search_postgresql():
+    """
+    PostgreSQL에서 사용자 검색용 pg_trgm 확장 및 인덱스 생성
+    CONCURRENTLY 옵션은 트랜잭션 안에서 실행할 수 없으므로 AUTOCOMMIT 연결 사용
+    """
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for index_name, create_sql in PREFIX_INDEXES:
+                logger.info(f"Creating index {index_name}...")
+                conn.execute(text(create_sql))
+
+            # pg_trgm은 contrib 패키지가 설치되어 있어야 함
+            logger.info("Enabling pg_trgm extension...")
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+
+            for index_name, create_sql in TRIGRAM_INDEXES:
+                logger.info(f"Creating index {index_name}...")
+                conn.execute(text(create_sql))
+            logger.info("User search indexes created successfully")
+    except Exception as e:
+        logger.error(f"Migration error: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    logger.info("Starting PostgreSQL user search migration...")
+    migrate_user_search_postgresql()
+    logger.info("PostgreSQL user search migration completed")